@@ -0,0 +1,199 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+from dataclasses import dataclass
+from robotModuleFunctions import (normalize, bin, feature_index, featurize, cumulant_loadThreshold,
+                                  feature_indices, cumulant_loadThreshold_batch,
+                                  make_load_threshold_cumulant, make_load_cumulant, SnapshotReader)
+from tdLearners import Horde, HordeIDBD
+from returnVerifier import StreamingVerifier, verifier_horizon
+from simulatedDynamixel import SimulatedPortHandler, SimulatedPacketHandler, LatencyModel
+
+# --- Learning Pipeline Benchmarks --------------------------------------------------------
+# Times the per-step functions of the learning loop and one full simulated control step, and
+# compares the throughput (calls/s) with a saved baseline. Runs with no motors and no display:
+#     python benchmarkPipeline.py --save baseline.json
+#     python benchmarkPipeline.py --compare baseline.json --threshold 0.2
+# exits with status 1 when any benchmark is more than `threshold` slower than its baseline.
+
+FEATURE_SIZES = [(10, 20), (100, 100), (1000, 1000)]  # (pos bins, vel bins): 200, 10k and 1M features
+NUM_PREDICTORS = [1, 10, 100]
+VERIFIER_GAMMAS = [0.5, 0.9, 0.99, 0.999]  # Verifier windows of 10 to 5000 steps
+MOTOR_IDS = [1, 2, 4, 5]
+HAND_IDX = 3
+
+@dataclass
+class BenchMovement:
+    MOTOR_VELO: int = 20
+    HAND_POS_1: int = 1750
+    HAND_POS_2: int = 2650
+
+@dataclass
+class BenchParams:
+    NUM_POS_BINS: int = 10
+    NUM_VEL_BINS: int = 20
+    LOAD_THRESHOLD: int = 100
+    MAX_LOAD: int = 300
+
+# Calls per second of fn() over repeated runs of at least min_time seconds (best run)
+def throughput(fn, min_time, repeats):
+    calls = 1
+    while True:  # Calibrate the number of calls per run
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        calls *= 10
+    calls = max(int(calls * min_time / elapsed), 1)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return calls / best
+
+# Benchmark name -> factory returning a zero-argument function that runs one call. Factories
+# only build their inputs (learners of up to 1M features) when the benchmark is selected.
+# Inputs cycle through a pre-generated stream of sensor values so results don't depend on one
+# lucky bin.
+def build_benchmarks():
+    rng = np.random.default_rng(0)
+    stream_length = 4096
+    pos = rng.integers(1650, 2750, stream_length).tolist()
+    vel = rng.integers(-25, 26, stream_length).tolist()
+    load = rng.integers(-400, 401, stream_length).tolist()
+    step = [0]
+    def sample():
+        step[0] = (step[0] + 1) % stream_length
+        return step[0]
+
+    movement = BenchMovement()
+    benchmarks = {
+        'normalize': lambda: lambda: normalize(pos[sample()], movement.HAND_POS_1, movement.HAND_POS_2),
+        'bin': lambda: lambda: bin(pos[sample()] / 4096, 20),
+        'cumulant_loadThreshold': lambda: lambda: cumulant_loadThreshold(load[sample()], 100),
+    }
+    # Batch versions, one call per whole stream
+    pos_array, vel_array, load_array = np.array(pos), np.array(vel), np.array(load, dtype=np.int16)
+    params = BenchParams()
+    benchmarks[f'feature_indices[batch {stream_length}]'] = lambda: lambda: feature_indices(pos_array, vel_array, movement, params)
+    benchmarks[f'cumulant_loadThreshold_batch[batch {stream_length}]'] = lambda: lambda: cumulant_loadThreshold_batch(load_array, 100)
+    for pos_bins, vel_bins in FEATURE_SIZES:
+        params = BenchParams(NUM_POS_BINS=pos_bins, NUM_VEL_BINS=vel_bins)
+        size = pos_bins * vel_bins
+        def run_feature_index(params=params):
+            i = sample()
+            return feature_index(pos[i], vel[i], movement, params)
+        def run_featurize(params=params):
+            i = sample()
+            return featurize(pos[i], vel[i], movement, params)
+        benchmarks[f'feature_index[{size}]'] = lambda fn=run_feature_index: fn
+        benchmarks[f'featurize[{size}]'] = lambda fn=run_featurize: fn
+
+        for num_predictors in NUM_PREDICTORS:
+            def td_update(learner_class, *learner_args, size=size, num_predictors=num_predictors, **learner_kwargs):
+                learner = learner_class(size, [0.9] * num_predictors, [make_load_threshold_cumulant(HAND_IDX, 100)],
+                                        0.1, *learner_args, **learner_kwargs)
+                active = np.random.default_rng(size).integers(0, size, (stream_length, 1))
+                c = np.zeros(learner.num_gvfs)
+                def run_td_update():
+                    i = sample()
+                    c[:] = load[i] > 100
+                    learner.update(active[i], c)
+                    return learner.predict(active[i])
+                return run_td_update
+            benchmarks[f'td_update[{size}x{num_predictors}]'] = lambda fn=td_update: fn(Horde)
+            benchmarks[f'td_autostep[{size}x{num_predictors}]'] = lambda fn=td_update: fn(HordeIDBD, 0.1, autostep=True)
+
+    for gamma in VERIFIER_GAMMAS:
+        def verifier_benchmark(gamma=gamma):
+            verifier = StreamingVerifier([gamma], normalize=True)
+            c, prediction = np.zeros(1), np.zeros(1)
+            def run_verifier():
+                i = sample()
+                c[0] = load[i] > 100
+                prediction[0] = vel[i] / 25
+                return verifier.update(c, prediction)
+            return run_verifier
+        benchmarks[f'verifier[L={verifier_horizon(gamma)}]'] = verifier_benchmark
+
+    benchmarks['control_step'] = build_control_step
+    return benchmarks
+
+# One learning-loop step against the simulated bus with the latency model switched off, so it
+# measures the software path (sync read, decode, featurize, cumulants, TD update, verifier)
+def build_control_step():
+    movement, params = BenchMovement(), BenchParams()
+    portHandler = SimulatedPortHandler('bench', MOTOR_IDS, latencyModel=LatencyModel(0, 0, 0))
+    packetHandler = SimulatedPacketHandler()
+    portHandler.openPort()
+    portHandler.setBaudRate(1000000)
+    reader = SnapshotReader(packetHandler, portHandler, MOTOR_IDS, 126, 128, 132)
+    cumulants = ([make_load_threshold_cumulant(HAND_IDX, params.LOAD_THRESHOLD)]
+                 + [make_load_cumulant(i, params.MAX_LOAD) for i in range(len(MOTOR_IDS))])
+    gammas = [0.5, 0.9, 0.99]
+    learner = Horde(params.NUM_POS_BINS * params.NUM_VEL_BINS, gammas, cumulants, 0.1)
+    verifier = StreamingVerifier(learner.gammas, normalize=True)
+    x_active = np.zeros(1, dtype=np.intp)
+    def run_control_step():
+        pos_all, vel_all, load_all = reader.read()
+        x_active[0] = feature_index(int(pos_all[HAND_IDX]), int(vel_all[HAND_IDX]), movement, params)
+        learner.update(x_active, learner.cumulant(pos_all, vel_all, load_all))
+        preds = learner.predict(x_active) * (1 - learner.gammas)
+        verifier.update(learner.c, preds)
+    return run_control_step
+
+def run_benchmarks(names, min_time, repeats):
+    benchmarks = build_benchmarks()
+    results = {}
+    for name, factory in benchmarks.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        ops = throughput(factory(), min_time, repeats)
+        results[name] = {'ops_per_sec': ops, 'us_per_op': 1e6 / ops}
+        print(f"{name:<40}{ops:>14,.0f} /s{1e6 / ops:>12.2f} us")
+    return results
+
+# Benchmarks whose throughput dropped by more than threshold relative to the baseline
+def regressions(results, baseline, threshold):
+    failed = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['ops_per_sec'] / baseline[name]['ops_per_sec']
+            if ratio < 1 - threshold:
+                failed.append((name, ratio))
+    return failed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the learning pipeline and check for regressions.")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="Run benchmarks whose name contains any of these")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per timed run (default: 0.2)")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per benchmark, best is kept (default: 3)")
+    parser.add_argument('--save', metavar='PATH', help="Save the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="Baseline to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed throughput drop vs. the baseline, as a fraction (default: 0.2)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, args.min_time, args.repeats)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                                   'platform': platform.platform(), 'processor': platform.processor()},
+                       'results': results}, f, indent=1)
+        print(f"Baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        failed = regressions(results, baseline, args.threshold)
+        for name, ratio in failed:
+            print(f"REGRESSION {name}: {ratio:.0%} of baseline throughput")
+        if failed:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
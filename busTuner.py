@@ -0,0 +1,213 @@
+import time
+import argparse
+from dataclasses import dataclass
+from dynamixel_sdk import *
+from robotModuleFunctions import read_from_motor, SnapshotReader
+from simulatedDynamixel import SimulatedPortHandler, SimulatedPacketHandler
+from stageTimers import LatencyHistogram
+
+# --- Bus Latency Probe and Tuner ---------------------------------------------------------
+# Measures round-trip latency on the motor bus for the three read patterns the scripts use (one
+# register of one motor, read_from_motor's three registers per motor, and one GroupSyncRead
+# snapshot of every motor) across baud rates and Return Delay Times, and reports the setting
+# with the highest sustainable snapshot rate. The motors are put back to their original setting
+# afterwards unless --apply is given.
+#     python busTuner.py --sim
+#     python busTuner.py --baud-rates 1000000 2000000 4000000 --return-delays 250 0 --apply
+# Baud rate and Return Delay Time are EEPROM registers: torque is switched off for the sweep.
+
+parser = argparse.ArgumentParser(description="Measure bus round trips and pick the baud rate and Return Delay Time.")
+parser.add_argument('--sim', action='store_true', help="Run against the simulated Dynamixel bus instead of DEVICE_NAME")
+parser.add_argument('--baud-rates', type=int, nargs='+', default=[57600, 115200, 1000000, 2000000, 3000000, 4000000],
+                    help="Baud rates to sweep (default: 57600 to 4000000)")
+parser.add_argument('--return-delays', type=int, nargs='+', default=[250, 100, 20, 0],
+                    help="Return Delay Time values to sweep, in 2 us units (default: 250 100 20 0)")
+parser.add_argument('--samples', type=int, default=100, help="Round trips per read pattern and setting (default: 100)")
+parser.add_argument('--max-time', type=float, default=1.0, help="Seconds per read pattern and setting, at most (default: 1)")
+parser.add_argument('--max-errors', type=float, default=0.0,
+                    help="Fraction of failed snapshots a setting may have and still be chosen (default: 0)")
+parser.add_argument('--apply', action='store_true', help="Leave the motors at the best setting instead of restoring the original")
+args = parser.parse_args()
+
+# --- Settings ---
+DEVICE_NAME = 'COM13'  # Change to your actual COM port
+PROTOCOL_VERSION = 2.0
+BAUDRATE = 1000000     # Tried first when looking for the motors
+MOTOR_IDS = [1, 2, 4, 5]
+
+# Control Table Addresses
+@dataclass
+class MotorAddresses:
+    BAUD_RATE: int = 8
+    RETURN_DELAY_TIME: int = 9
+    TORQUE_ENABLE: int = 64
+    PRESENT_LOAD: int = 126
+    PRESENT_VELOCITY: int = 128
+    PRESENT_POSITION: int = 132
+
+# Baud rates the XL330 supports, by BAUD_RATE register value
+XL330_BAUD_RATES = {0: 9600, 1: 57600, 2: 115200, 3: 1000000, 4: 2000000, 5: 3000000, 6: 4000000}
+
+# --- Bus Functions ---
+def ping_all(packetHandler, portHandler, motor_ids):
+    return all(packetHandler.ping(portHandler, m_id)[1] == COMM_SUCCESS for m_id in motor_ids)
+
+# Find the baud rate every motor answers at, trying `first` before the others
+def find_baud_rate(packetHandler, portHandler, motor_ids, first):
+    for baud in [first] + [b for b in XL330_BAUD_RATES.values() if b != first]:
+        portHandler.setBaudRate(baud)
+        if ping_all(packetHandler, portHandler, motor_ids):
+            return baud
+    raise RuntimeError(f"Motors {motor_ids} don't all answer at any one baud rate")
+
+# Bring every motor to `baud`, wherever an interrupted sweep left each of them
+def gather_motors(packetHandler, portHandler, motor_ids, addresses, baud):
+    baud_index = {b: i for i, b in XL330_BAUD_RATES.items()}[baud]
+    for other in XL330_BAUD_RATES.values():
+        if other == baud:
+            continue
+        portHandler.setBaudRate(other)
+        for m_id in motor_ids:
+            if packetHandler.ping(portHandler, m_id)[1] == COMM_SUCCESS:
+                packetHandler.write1ByteTxRx(portHandler, m_id, addresses.BAUD_RATE, baud_index)
+    portHandler.setBaudRate(baud)
+    time.sleep(0.01)
+    if not ping_all(packetHandler, portHandler, motor_ids):
+        raise RuntimeError(f"Motors {motor_ids} don't all answer at {baud} baud")
+
+# Set Return Delay Time, then baud rate, on every motor and follow them with the host's baud rate
+def configure(packetHandler, portHandler, motor_ids, addresses, baud, return_delay):
+    baud_index = {b: i for i, b in XL330_BAUD_RATES.items()}[baud]
+    for m_id in motor_ids:
+        packetHandler.write1ByteTxRx(portHandler, m_id, addresses.RETURN_DELAY_TIME, return_delay)
+    for m_id in motor_ids:
+        # The status packet still goes out at the old baud rate; ping below checks the switch
+        packetHandler.write1ByteTxRx(portHandler, m_id, addresses.BAUD_RATE, baud_index)
+    portHandler.setBaudRate(baud)
+    time.sleep(0.01)  # Let the motors reinitialize their UART
+    if not ping_all(packetHandler, portHandler, motor_ids):
+        raise RuntimeError(f"Motors stopped answering after switching to {baud} baud")
+    for m_id in motor_ids:
+        value, result, _ = packetHandler.read1ByteTxRx(portHandler, m_id, addresses.RETURN_DELAY_TIME)
+        if result != COMM_SUCCESS or value != return_delay:
+            raise RuntimeError(f"Motor {m_id} did not take Return Delay Time {return_delay} (is torque off?)")
+
+# Round-trip latency of fn() (which returns False on a failed read) over up to `samples` calls
+# or `max_time` seconds, whichever comes first
+def measure(fn, samples, max_time):
+    histogram = LatencyHistogram()
+    errors = 0
+    deadline = time.perf_counter() + max_time
+    for _ in range(samples):
+        start = time.perf_counter()
+        ok = fn()
+        end = time.perf_counter()
+        histogram.record(end - start)
+        errors += not ok
+        if end > deadline:
+            break
+    return histogram, errors
+
+def probe(packetHandler, portHandler, motor_ids, addresses, samples, max_time):
+    snapshotReader = SnapshotReader(packetHandler, portHandler, motor_ids,
+                                    addresses.PRESENT_LOAD, addresses.PRESENT_VELOCITY, addresses.PRESENT_POSITION)
+    def single_read():
+        return packetHandler.read4ByteTxRx(portHandler, motor_ids[-1], addresses.PRESENT_POSITION)[1] == COMM_SUCCESS
+    def three_register_reads():
+        # read_from_motor doesn't report failures (the SDK returns 0), so this always counts as a success
+        for m_id in motor_ids:
+            read_from_motor(packetHandler, portHandler, m_id, addresses)
+        return True
+    def sync_read():
+        return snapshotReader.read() is not None
+    return {'single': measure(single_read, samples, max_time),
+            'read_from_motor': measure(three_register_reads, samples, max_time),
+            'sync_read': measure(sync_read, samples, max_time)}
+
+# Snapshots per second the bus sustains back to back (the p99 columns show how much it jitters)
+def sustainable_rate(histogram):
+    return histogram.count / histogram.total
+
+def report(results):
+    lines = [f"{'baud':>8}{'RDT':>5}  {'single p50/p99 us':>18}  {'read_from_motor p50/p99 us':>27}"
+             f"  {'sync_read p50/p99 us':>21}{'errors':>8}{'snapshot Hz':>13}"]
+    for (baud, return_delay), patterns in results.items():
+        cells = []
+        for name, width in (('single', 18), ('read_from_motor', 27), ('sync_read', 21)):
+            histogram, _ = patterns[name]
+            cells.append(f"{histogram.percentile(50) * 1e6:.0f}/{histogram.percentile(99) * 1e6:.0f}".rjust(width))
+        histogram, errors = patterns['sync_read']
+        lines.append(f"{baud:>8}{return_delay:>5}  " + "  ".join(cells)
+                     + f"{errors:>8}{sustainable_rate(histogram):>13.0f}")
+    return "\n".join(lines)
+
+# Setting with the highest sustainable snapshot rate among those within the error budget
+def best_setting(results, max_errors):
+    usable = {setting: patterns['sync_read'] for setting, patterns in results.items()
+              if patterns['sync_read'][1] <= max_errors * patterns['sync_read'][0].count}
+    if not usable:
+        return None
+    return max(usable, key=lambda setting: sustainable_rate(usable[setting][0]))
+
+# --- Setup SDK ---
+addresses = MotorAddresses()
+if args.sim:
+    portHandler = SimulatedPortHandler(DEVICE_NAME, MOTOR_IDS)
+    packetHandler = SimulatedPacketHandler(PROTOCOL_VERSION)
+else:
+    portHandler = PortHandler(DEVICE_NAME)
+    packetHandler = PacketHandler(PROTOCOL_VERSION)
+if not portHandler.openPort():
+    raise SystemExit(f"Failed to open {DEVICE_NAME}")
+
+original_baud = find_baud_rate(packetHandler, portHandler, MOTOR_IDS, BAUDRATE)
+original_delays = {m_id: packetHandler.read1ByteTxRx(portHandler, m_id, addresses.RETURN_DELAY_TIME)[0] for m_id in MOTOR_IDS}
+original_delay = original_delays[MOTOR_IDS[0]]
+print(f"Motors {MOTOR_IDS} at {original_baud} baud, Return Delay Time {original_delays}")
+for m_id in MOTOR_IDS:
+    packetHandler.write1ByteTxRx(portHandler, m_id, addresses.TORQUE_ENABLE, 0)
+
+# --- Sweep ---
+results = {}
+try:
+    for baud in args.baud_rates:
+        for return_delay in args.return_delays:
+            configure(packetHandler, portHandler, MOTOR_IDS, addresses, baud, return_delay)
+            results[(baud, return_delay)] = probe(packetHandler, portHandler, MOTOR_IDS, addresses, args.samples, args.max_time)
+            snapshot = results[(baud, return_delay)]['sync_read'][0]
+            print(f"{baud:>8} baud, RDT {return_delay:>3}: {sustainable_rate(snapshot):.0f} snapshots/s")
+except KeyboardInterrupt:
+    print("Sweep interrupted")
+except RuntimeError as e:
+    print(f"Sweep stopped: {e}")
+
+print(report(results))
+best = best_setting(results, args.max_errors)
+if best is None:
+    print("No setting met the error budget")
+else:
+    print(f"Best: {best[0]} baud, Return Delay Time {best[1]} "
+          f"({sustainable_rate(results[best]['sync_read'][0]):.0f} snapshots/s)")
+
+# --- Apply or Restore ---
+# An interrupt may have come in the middle of configure(), with only some motors switched, so the
+# motors are gathered at the target baud rate first
+target_baud = best[0] if args.apply and best is not None else original_baud
+try:
+    gather_motors(packetHandler, portHandler, MOTOR_IDS, addresses, target_baud)
+    if args.apply and best is not None:
+        configure(packetHandler, portHandler, MOTOR_IDS, addresses, *best)
+        print(f"Applied. Set BAUDRATE = {best[0]} in the scripts.")
+    else:
+        # Per-motor Return Delay Times are restored one by one after the common baud rate
+        configure(packetHandler, portHandler, MOTOR_IDS, addresses, original_baud, original_delay)
+        for m_id, return_delay in original_delays.items():
+            packetHandler.write1ByteTxRx(portHandler, m_id, addresses.RETURN_DELAY_TIME, return_delay)
+        print(f"Restored {original_baud} baud and the original Return Delay Times.")
+except (RuntimeError, KeyboardInterrupt) as e:
+    print(f"Failed to {'apply' if args.apply and best is not None else 'restore'} the motor settings "
+          f"({e or 'interrupted'}). They may be left at a swept baud rate and Return Delay Time; "
+          f"originally {original_baud} baud, Return Delay Time {original_delays}.")
+    portHandler.closePort()
+    raise SystemExit(1)
+portHandler.closePort()
@@ -0,0 +1,75 @@
+import queue
+import itertools
+import threading
+from concurrent.futures import Future
+
+# --- Serialized Bus Access ---------------------------------------------------------------
+# The Dynamixel bus is half duplex and the SDK isn't thread safe, so one worker thread owns
+# the port and every other thread submits jobs to it. Jobs return concurrent.futures.Future
+# objects: block with .result(), or await them with asyncio.wrap_future(future).
+
+# Priorities, lowest served first. Within a priority jobs run in submission order.
+SAFETY = 0    # Pause/stop writes
+SNAPSHOT = 1  # Periodic sensor reads for the learning loop
+COMMAND = 2   # Goal/profile writes
+_STOP = 99    # Sentinel: runs after everything already queued
+
+class BusWorker:
+    def __init__(self, packetHandler, portHandler, snapshotReader=None):
+        self.packetHandler = packetHandler
+        self.portHandler = portHandler
+        self.snapshotReader = snapshotReader
+        self.queue = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.snapshot_lock = threading.Lock()
+        self.pending_snapshot = None  # Shared by every snapshot request made before the next read
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    # Drain the queue, then stop the worker
+    def stop(self):
+        self.submit(_STOP, None)
+        self.thread.join()
+
+    # Run fn(packetHandler, portHandler, *args) on the worker thread
+    def submit(self, priority, fn, *args):
+        future = Future()
+        self.queue.put((priority, next(self.sequence), future, fn, args))
+        return future
+
+    # One snapshot (SnapshotReader.read() result) for all callers waiting on it: requests made
+    # while a read is still queued share that read instead of adding another transaction
+    def snapshot(self):
+        with self.snapshot_lock:
+            if self.pending_snapshot is None:
+                self.pending_snapshot = self.submit(SNAPSHOT, self._read_snapshot)
+            return self.pending_snapshot
+
+    def read4(self, dxl_id, address, priority=COMMAND):
+        return self.submit(priority, lambda ph, port: ph.read4ByteTxRx(port, dxl_id, address))
+
+    def write1(self, dxl_id, address, value, priority=COMMAND):
+        return self.submit(priority, lambda ph, port: ph.write1ByteTxRx(port, dxl_id, address, value))
+
+    def write4(self, dxl_id, address, value, priority=COMMAND):
+        return self.submit(priority, lambda ph, port: ph.write4ByteTxRx(port, dxl_id, address, value))
+
+    def _read_snapshot(self, packetHandler, portHandler):
+        with self.snapshot_lock:
+            self.pending_snapshot = None  # Later requests need a fresh read
+        return self.snapshotReader.read()
+
+    def _run(self):
+        while True:
+            priority, _, future, fn, args = self.queue.get()
+            if priority == _STOP:
+                future.set_result(None)
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(self.packetHandler, self.portHandler, *args))
+            except Exception as e:
+                future.set_exception(e)
@@ -1,9 +1,16 @@
 import time
+import argparse
 import threading
 import matplotlib.pyplot as plt
 from collections import deque
 from pynput import keyboard
 from dynamixel_sdk import *
+from robotModuleFunctions import SnapshotReader, JointCommander
+from simulatedDynamixel import SimulatedPortHandler, SimulatedPacketHandler
+
+parser = argparse.ArgumentParser(description="Keyboard teleoperation with a live position scope.")
+parser.add_argument('--sim', action='store_true', help="Run against the simulated Dynamixel bus instead of DEVICE_NAME")
+args = parser.parse_args()
 
 # --- Settings ---
 DEVICE_NAME = 'COM13'  # Change to your actual COM port
@@ -17,6 +24,7 @@ ADDR_GOAL_POSITION    = 116
 ADDR_PRESENT_POSITION = 132
 ADDR_PROFILE_VELOCITY = 112
 ADDR_PRESENT_VELOCITY = 128
+ADDR_PRESENT_LOAD     = 126
 
 class Motor:
     def __init__(self, dxl_id, cw_limit, ccw_limit, speed, name, color, inverted=False):
@@ -49,13 +57,23 @@ key_map = {
 }
 
 # --- Setup SDK ---
-portHandler = PortHandler(DEVICE_NAME)
-packetHandler = PacketHandler(PROTOCOL_VERSION)
+if args.sim:
+    portHandler = SimulatedPortHandler(DEVICE_NAME, [m.id for m in motors.values()])
+    packetHandler = SimulatedPacketHandler(PROTOCOL_VERSION)
+else:
+    portHandler = PortHandler(DEVICE_NAME)
+    packetHandler = PacketHandler(PROTOCOL_VERSION)
 portHandler.openPort()
 portHandler.setBaudRate(BAUDRATE)
 
-for m in motors.values():
-    packetHandler.write1ByteTxRx(portHandler, m.id, ADDR_TORQUE_ENABLE, 1)
+# Torque on/off for every motor in one GroupSyncWrite packet
+jointCommander = JointCommander(packetHandler, portHandler, [m.id for m in motors.values()],
+                                ADDR_PROFILE_VELOCITY, ADDR_GOAL_POSITION, ADDR_TORQUE_ENABLE)
+jointCommander.torque(True)
+
+# Reads every motor in one GroupSyncRead packet per frame
+snapshotReader = SnapshotReader(packetHandler, portHandler, [m.id for m in motors.values()],
+                                ADDR_PRESENT_LOAD, ADDR_PRESENT_VELOCITY, ADDR_PRESENT_POSITION)
 
 # --- Logic Functions ---
 def stop_motor(m):
@@ -112,11 +130,11 @@ print("Controls: A/D, W/S, J/L, I/K, O/P. Close plot to exit.")
 # --- Main Loop ---
 try:
     while plt.fignum_exists(fig.number):
-        for name, m in motors.items():
-            # Read hardware
-            pos, _, _ = packetHandler.read4ByteTxRx(portHandler, m.id, ADDR_PRESENT_POSITION)
-            if pos is not None:
-                m.history.append(pos)
+        # Read hardware
+        snapshot = snapshotReader.read()
+        for i, (name, m) in enumerate(motors.items()):
+            if snapshot is not None:
+                m.history.append(int(snapshot[0][i]))
             
             # Update the specific line on the plot
             lines[name].set_ydata(list(m.history))
@@ -131,6 +149,5 @@ except KeyboardInterrupt:
 # --- Cleanup ---
 print("Shutting down...")
 listener.stop()
-for m in motors.values():
-    packetHandler.write1ByteTxRx(portHandler, m.id, ADDR_TORQUE_ENABLE, 0)
+jointCommander.torque(False)
 portHandler.closePort()
\ No newline at end of file
@@ -1,6 +1,18 @@
 import time
+import argparse
+import threading
+import numpy as np
 from pynput import keyboard
 from dynamixel_sdk import *
+from robotModuleFunctions import SnapshotReader, JointCommander, interpolate_trajectory
+from simulatedDynamixel import SimulatedPortHandler, SimulatedPacketHandler
+from loopScheduler import FixedRateScheduler, wait_until
+from sensorLog import SensorRecorder, open_log, log_motor_ids, snapshot_records
+
+parser = argparse.ArgumentParser(description="Teaching mode: record poses by hand and play them back.")
+parser.add_argument('--sim', action='store_true', help="Run against the simulated Dynamixel bus instead of DEVICE_NAME")
+parser.add_argument('--demo', metavar='PATH', default='demo.bin', help="Demonstration file saved by 'R' and loaded by 'L' (default: demo.bin)")
+args = parser.parse_args()
 
 # --- Settings ---
 DEVICE_NAME = 'COM13'  # Update to your port
@@ -11,69 +23,156 @@ ADDR_TORQUE_ENABLE    = 64
 ADDR_GOAL_POSITION    = 116
 ADDR_PRESENT_POSITION = 132
 ADDR_PROFILE_VELOCITY = 112
+ADDR_PRESENT_VELOCITY = 128
+ADDR_PRESENT_LOAD     = 126
+
+# Playback streams interpolated setpoints instead of jumping between poses
+PLAYBACK_RATE  = 50   # Setpoints per second
+PLAYBACK_SPEED = 300  # Fastest joint speed during playback (position units/s)
+RECORD_RATE    = 100  # Samples per second while capturing a demonstration
 
 # Motor IDs (1-4 for arm, 5 for gripper)
 MOTOR_IDS = [1, 2, 4, 5]
 recorded_poses = []
 torque_on = False
+recording = False
+recorder_thread = None
+demo = None  # (t, poses) of the loaded demonstration
 
 # --- SDK Setup ---
-portHandler = PortHandler(DEVICE_NAME)
-packetHandler = PacketHandler(PROTOCOL_VERSION)
+if args.sim:
+    portHandler = SimulatedPortHandler(DEVICE_NAME, MOTOR_IDS)
+    packetHandler = SimulatedPacketHandler(PROTOCOL_VERSION)
+else:
+    portHandler = PortHandler(DEVICE_NAME)
+    packetHandler = PacketHandler(PROTOCOL_VERSION)
 portHandler.openPort()
 portHandler.setBaudRate(BAUDRATE)
 
+# One sync-read packet per pose read, one sync-write packet per command to all motors
+snapshotReader = SnapshotReader(packetHandler, portHandler, MOTOR_IDS, ADDR_PRESENT_LOAD,
+                                ADDR_PRESENT_VELOCITY, ADDR_PRESENT_POSITION)
+jointCommander = JointCommander(packetHandler, portHandler, MOTOR_IDS, ADDR_PROFILE_VELOCITY,
+                                ADDR_GOAL_POSITION, ADDR_TORQUE_ENABLE)
+
 def set_torque(state):
     global torque_on
-    val = 1 if state else 0
-    for m_id in MOTOR_IDS:
-        packetHandler.write1ByteTxRx(portHandler, m_id, ADDR_TORQUE_ENABLE, val)
+    jointCommander.torque(state)
     torque_on = state
     print(f"--- Torque {'ENABLED' if state else 'DISABLED (Limp Mode)'} ---")
 
 def record_pose():
-    current_pose = []
-    for m_id in MOTOR_IDS:
-        pos, _, _ = packetHandler.read4ByteTxRx(portHandler, m_id, ADDR_PRESENT_POSITION)
-        current_pose.append(pos)
+    snapshot = snapshotReader.read()
+    if snapshot is None:
+        print("Failed to read the pose, try again.")
+        return
+    current_pose = snapshot[0].tolist()
     recorded_poses.append(current_pose)
     print(f"Pose #{len(recorded_poses)} recorded: {current_pose}")
 
+# Smoothly move from the present pose through the given poses
+def move_through(poses):
+    snapshot = snapshotReader.read()
+    start_pose = snapshot[0] if snapshot is not None else poses[0]
+    trajectory = interpolate_trajectory([start_pose] + list(poses), PLAYBACK_SPEED / PLAYBACK_RATE)
+    print(f"Streaming {len(trajectory)} setpoints ({len(trajectory) / PLAYBACK_RATE:.1f} s)...")
+
+    # Hold the current pose before enabling torque, with profile velocity 0 (no limit) so the
+    # joints track the streamed setpoints instead of lagging behind a profile
+    jointCommander.write(trajectory[0], 0)
+    set_torque(True)
+
+    scheduler = FixedRateScheduler(PLAYBACK_RATE)
+    for setpoint in trajectory[1:]:
+        scheduler.wait()
+        jointCommander.write(setpoint)
+    print(scheduler.report())
+
 def play_motion():
     if not recorded_poses:
         print("No poses recorded yet!")
         return
     
     print("Starting Playback...")
-    set_torque(True)
-    
-    # Set a moderate speed for playback
-    for m_id in MOTOR_IDS:
-        packetHandler.write4ByteTxRx(portHandler, m_id, ADDR_PROFILE_VELOCITY, 20)
-
-    for pose in recorded_poses:
-        print(f"Moving to: {pose}")
-        for i, m_id in enumerate(MOTOR_IDS):
-            packetHandler.write4ByteTxRx(portHandler, m_id, ADDR_GOAL_POSITION, pose[i])
-        
-        # Wait a moment for the arm to reach the position
-        time.sleep(1.5) 
-    
+    move_through(recorded_poses)
     print("Playback Finished.")
 
+# --- Continuous Demonstrations ---
+# Samples every joint at RECORD_RATE while the arm is limp, straight into a memory-mapped
+# sensor log (preallocated, timestamped, one fixed-width record per motor per sample)
+def capture_demo(recorder):
+    scheduler = FixedRateScheduler(RECORD_RATE)
+    scheduler.start()
+    start = time.perf_counter()
+    try:
+        while recording:
+            scheduler.wait()
+            snapshot = snapshotReader.read()
+            if snapshot is not None:
+                pos, vel, load = snapshot
+                recorder.record(time.perf_counter() - start, pos, vel, load, pos, False)  # Limp: goal is wherever the arm is
+    finally:
+        recorder.close()  # Writes the final count; without it the demo can't be loaded
+    print(scheduler.report())
+    print(f"Demonstration of {recorder.count // len(MOTOR_IDS)} samples saved to {args.demo}")
+
+def toggle_demo_recording():
+    global recording, recorder_thread
+    if not recording:
+        set_torque(False)
+        recording = True
+        recorder_thread = threading.Thread(target=capture_demo, args=(SensorRecorder(args.demo, MOTOR_IDS),))
+        recorder_thread.start()
+        print(f"Recording demonstration at {RECORD_RATE} Hz... press 'R' again to stop.")
+    else:
+        recording = False
+        recorder_thread.join()
+        load_demo()
+
+def load_demo():
+    global demo
+    if log_motor_ids(args.demo) != MOTOR_IDS:
+        print(f"{args.demo} was recorded with motors {log_motor_ids(args.demo)}, not {MOTOR_IDS}")
+        return
+    samples = snapshot_records(open_log(args.demo), len(MOTOR_IDS))
+    demo = (np.array(samples['t'][:, 0]), np.array(samples['pos']))
+    print(f"Loaded {len(samples)} samples ({demo[0][-1] if len(samples) else 0:.1f} s) from {args.demo}")
+
+# Move to the first sample, then replay every sample at its recorded time
+def play_demo():
+    if demo is None or len(demo[0]) == 0:
+        print("No demonstration loaded!")
+        return
+    t, poses = demo
+    print("Moving to the start of the demonstration...")
+    move_through(poses[:1])
+    print("Replaying demonstration...")
+    start = time.perf_counter() - t[0]
+    for t_i, pose in zip(t, poses):
+        wait_until(start + t_i)
+        jointCommander.write(pose)
+    print("Demonstration Finished.")
+
 # --- Keyboard Handling ---
 def on_press(key):
     try:
         # 1. Handle "Special" Keys first (keys without a .char attribute)
         if key == keyboard.Key.esc:
             print("\nExiting Teaching Mode...")
+            if recording:
+                toggle_demo_recording()
             return False  # This is the "magic" line that stops the listener
+
+        # The capture thread owns the bus while recording
+        if recording and getattr(key, 'char', None) != 'r':
+            print("Press 'R' to stop recording first.")
+            return
             
         if key == keyboard.Key.space:
             record_pose()
             return # Keep the listener going
 
-        # 2. Handle "Character" Keys (t, p, c)
+        # 2. Handle "Character" Keys (t, p, c, r, l, d)
         if hasattr(key, 'char'):
             if key.char == 't': # Toggle Torque
                 set_torque(not torque_on)
@@ -82,6 +181,12 @@ def on_press(key):
             elif key.char == 'c': # Clear
                 recorded_poses.clear()
                 print("All poses recorded have been cleared.")
+            elif key.char == 'r': # Start/stop continuous recording
+                toggle_demo_recording()
+            elif key.char == 'l': # Load the saved demonstration
+                load_demo()
+            elif key.char == 'd': # Replay the demonstration
+                play_demo()
                 
     except Exception as e:
         print(f"Error in keyboard listener: {e}")
@@ -93,6 +198,8 @@ print("2. Press SPACE to save a pose.")
 print("3. Press 'T' to lock/unlock torque.")
 print("4. Press 'P' to play back.")
 print("5. Press 'C' to clear recording.")
+print("6. Press 'R' to start/stop recording a continuous demonstration.")
+print("7. Press 'L' to load the saved demonstration, 'D' to replay it.")
 print("Press ESC to quit.")
 
 with keyboard.Listener(on_press=on_press) as listener:
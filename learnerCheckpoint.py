@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+import numpy as np
+
+# --- Learner Checkpoints -----------------------------------------------------------------
+# A checkpoint is an 8-byte magic, the length of a JSON metadata block, the metadata, and then
+# the learner's arrays stored raw at 64-byte aligned offsets. Loading maps the file and hands
+# back memory-mapped arrays, so restoring is one copy per array straight into the learner.
+
+CHECKPOINT_MAGIC = b'TDCKPT01'
+ALIGN = 64
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+# Write state (name -> array) and metadata (JSON-serializable) to path, atomically
+def save_checkpoint(path, state, metadata):
+    arrays = {}
+    offset = 0
+    for name, array in state.items():
+        array = np.asarray(array)
+        order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+        arrays[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'order': order, 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'metadata': metadata, 'arrays': arrays}).encode()
+    data_start = _aligned(len(CHECKPOINT_MAGIC) + 8 + len(header))
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(CHECKPOINT_MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for name, array in state.items():
+            f.seek(data_start + arrays[name]['offset'])
+            f.write(np.asarray(array).tobytes(order=arrays[name]['order']))
+    os.replace(temp_path, path)  # A crash mid-save leaves the previous checkpoint intact
+
+# Returns (state, metadata); the arrays in state are read-only memory maps of the file
+def load_checkpoint(path):
+    with open(path, 'rb') as f:
+        if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{path} is not a learner checkpoint")
+        header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(header_length))
+    data_start = _aligned(len(CHECKPOINT_MAGIC) + 8 + header_length)
+    state = {}
+    for name, entry in header['arrays'].items():
+        shape = tuple(entry['shape'])
+        if int(np.prod(shape)) == 0:
+            state[name] = np.zeros(shape, dtype=entry['dtype'])  # memmap can't map zero bytes
+        else:
+            state[name] = np.memmap(path, dtype=entry['dtype'], mode='r', offset=data_start + entry['offset'],
+                                    shape=shape, order=entry['order'])
+    return state, header['metadata']
+
+# Copies a learner's state a piece at a time, so a checkpoint costs the learning loop about
+# chunk_bytes of copying per step instead of one stall for all of W. Large arrays are copied in
+# pieces over consecutive steps, so the copy mixes weights from those few steps (harmless for a
+# warm start); everything else is copied whole on the step that finishes the copy.
+class IncrementalCopy:
+    def __init__(self, learner, chunk_bytes=1 << 20):
+        self.learner = learner
+        self.chunk_bytes = chunk_bytes
+        self.copies = None
+
+    @property
+    def active(self):
+        return self.copies is not None
+
+    def start(self):
+        live = self.learner.state(copy=False)
+        self.copies = {name: np.empty_like(array) for name, array in live.items() if array.nbytes > self.chunk_bytes}
+        self.queue = list(self.copies)
+        self.position = 0  # Elements of queue[0] copied so far
+
+    # Copy the next piece. Returns the finished state on the step that completes it, else None.
+    def step(self):
+        live = self.learner.state(copy=False)
+        budget = self.chunk_bytes
+        while self.queue and budget > 0:
+            name = self.queue[0]
+            if live[name].shape != self.copies[name].shape:  # Traces grew or shrank: start this array over
+                self.copies[name] = np.empty_like(live[name])
+                self.position = 0
+            source, target = live[name].ravel(order='K'), self.copies[name].ravel(order='K')
+            end = min(self.position + max(budget // source.itemsize, 1), source.size)
+            target[self.position:end] = source[self.position:end]
+            budget -= (end - self.position) * source.itemsize
+            if end == source.size:
+                self.queue.pop(0)
+                self.position = 0
+            else:
+                self.position = end
+        if self.queue:
+            return None
+        state = {}
+        for name, array in live.items():
+            copy = self.copies.get(name)
+            state[name] = copy if copy is not None and copy.shape == array.shape else np.array(array, order='K')
+        self.copies = None
+        return state
+
+# Saves checkpoints on a background thread. Only the newest submitted state is kept, so a slow
+# disk never queues up copies of the weights.
+class CheckpointWriter:
+    def __init__(self, path):
+        self.path = path
+        self.condition = threading.Condition()
+        self.pending = None
+        self.closed = False
+        self.saved = 0
+        self.error = None  # Exception of the latest save, if it failed
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # state must not be modified afterwards (e.g. the copies returned by learner.state())
+    def submit(self, state, metadata):
+        with self.condition:
+            self.pending = (state, metadata)
+            self.condition.notify()
+
+    # Write whatever is still pending and stop the thread
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.closed)
+                if self.pending is None:
+                    return
+                state, metadata = self.pending
+                self.pending = None
+            try:
+                save_checkpoint(self.path, state, metadata)
+            except Exception as e:  # Keep the thread alive; the owner checks error after close()
+                self.error = e
+                continue
+            self.error = None
+            self.saved += 1
@@ -0,0 +1,94 @@
+import time
+import numpy as np
+
+# --- Live Plotting -----------------------------------------------------------------------
+# The learning loop writes samples into a TraceHistory; a LivePlot redraws it from the GUI
+# thread at its own frame rate, so the loop never waits on matplotlib. matplotlib is only
+# imported by LivePlot.run, so headless runs can use TraceHistory without it.
+
+# Fixed-size history of several signals. Every sample is written twice (at head and head +
+# window_size) so the latest window is always one contiguous slice and reading never copies.
+class TraceHistory:
+    def __init__(self, names, window_size, initial_values=None):
+        self.names = list(names)
+        self.channel = {name: i for i, name in enumerate(self.names)}
+        self.window_size = window_size
+        self.data = np.zeros((len(self.names), 2 * window_size))
+        if initial_values is not None:
+            self.data[:] = np.asarray(initial_values, dtype=float)[:, None]
+        self.head = 0  # Slot of the next sample
+
+    # Append one sample per channel (values in the order of names)
+    def append(self, values):
+        self.data[:, self.head] = values
+        self.data[:, self.head + self.window_size] = values
+        self.head = (self.head + 1) % self.window_size
+
+    # Overwrite the value `lag` samples back (lag=1 is the most recent sample)
+    def set_past(self, name, lag, value):
+        if lag > self.window_size:
+            return  # Already scrolled off the plot
+        slot = (self.head - lag) % self.window_size
+        self.data[self.channel[name], slot] = value
+        self.data[self.channel[name], slot + self.window_size] = value
+
+    # Oldest-to-newest view of the last window_size samples of one channel
+    def view(self, name):
+        return self.data[self.channel[name], self.head:self.head + self.window_size]
+
+# Redraws a figure at a fixed frame rate. The axes, labels and grid are cached as a background
+# image and only the line artists are redrawn and blitted each frame.
+class LivePlot:
+    def __init__(self, fig, lines, history, fps=30, timers=None):
+        self.fig = fig
+        self.timers = timers  # Optional StageTimers, records the time of each redraw as 'render'
+        self.lines = lines  # {channel name: Line2D}
+        self.history = history
+        self.frame_period = 1 / fps
+        self.background = None
+        self.use_blit = fig.canvas.supports_blit
+        for line in self.lines.values():
+            line.set_animated(self.use_blit)
+        # Re-cache the background whenever the full figure is redrawn (first show, resize)
+        fig.canvas.mpl_connect('draw_event', self._cache_background)
+
+    def _cache_background(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            self.fig.draw_artist(line)
+
+    def refresh(self):
+        start = time.perf_counter()
+        for name, line in self.lines.items():
+            line.set_ydata(self.history.view(name))
+        if self.use_blit and self.background is not None:
+            self.fig.canvas.restore_region(self.background)
+            self._draw_lines()
+            self.fig.canvas.blit(self.fig.bbox)
+        else:
+            self.fig.canvas.draw_idle()
+        self.fig.canvas.flush_events()
+        if self.timers is not None:
+            self.timers.lap('render', start)
+
+    # Redraw until the window is closed or keep_running() returns False. While skip_frame()
+    # returns True (e.g. the learning loop is missing deadlines) only GUI events are processed.
+    def run(self, keep_running=lambda: True, skip_frame=lambda: False):
+        import matplotlib.pyplot as plt
+        plt.show(block=False)
+        self.fig.canvas.draw()
+        next_frame = time.perf_counter()
+        while plt.fignum_exists(self.fig.number) and keep_running():
+            if skip_frame():
+                self.fig.canvas.flush_events()
+            else:
+                self.refresh()
+            next_frame += self.frame_period
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.perf_counter()  # Fell behind: don't try to catch up
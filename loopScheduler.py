@@ -0,0 +1,68 @@
+import time
+
+# --- Fixed-Rate Loop Scheduler -----------------------------------------------------------
+# Paces a loop on an absolute grid of deadlines (start + k*period) instead of sleeping a fixed
+# time after the work, so the period doesn't drift with bus, learning or render time.
+
+# Sleep for the bulk of the wait and spin the last fraction of a millisecond for accuracy
+def wait_until(deadline, spin=0.0005):
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        pass
+
+class FixedRateScheduler:
+    def __init__(self, rate_hz, spin=0.0005, pressure_window=1.0):
+        self.period = 1 / rate_hz
+        self.spin = spin
+        self.pressure_window = pressure_window  # Seconds after a miss during which optional work is shed
+        self.next_deadline = None
+        self.last_miss = -float('inf')
+        # Statistics
+        self.ticks = 0
+        self.missed = 0  # Deadlines that passed before the loop was ready for them
+        self.shed = 0    # Times optional work was skipped
+        self.jitter_sum = 0.0  # Wake-up lateness relative to the deadline
+        self.jitter_max = 0.0
+
+    def start(self):
+        self.next_deadline = time.perf_counter() + self.period
+
+    # Block until the next deadline. If the work overran, the missed deadlines are counted and
+    # the loop waits for the next one on the grid, keeping the sample times evenly spaced.
+    def wait(self):
+        if self.next_deadline is None:
+            self.start()
+        now = time.perf_counter()
+        if now > self.next_deadline:
+            skipped = int((now - self.next_deadline) / self.period) + 1
+            self.missed += skipped
+            self.next_deadline += skipped * self.period
+            self.last_miss = now
+        wait_until(self.next_deadline, self.spin)
+        lateness = time.perf_counter() - self.next_deadline
+        self.jitter_sum += lateness
+        self.jitter_max = max(self.jitter_max, lateness)
+        self.ticks += 1
+        self.next_deadline += self.period
+
+    # Seconds left before the next deadline
+    def time_left(self):
+        return self.next_deadline - time.perf_counter()
+
+    # True if optional work expected to take `budget` seconds should be skipped this tick
+    def should_shed(self, budget):
+        if self.time_left() < budget:
+            self.shed += 1
+            return True
+        return False
+
+    # True shortly after a missed deadline (lets other threads back off, e.g. the plot)
+    def under_pressure(self):
+        return time.perf_counter() - self.last_miss < self.pressure_window
+
+    def report(self):
+        mean_jitter = self.jitter_sum / self.ticks if self.ticks else 0.0
+        return (f"Loop: {self.ticks} ticks at {1 / self.period:.0f} Hz, {self.missed} missed deadlines, "
+                f"{self.shed} shed, jitter mean {mean_jitter * 1e6:.0f} us / max {self.jitter_max * 1e6:.0f} us")
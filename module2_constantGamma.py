@@ -1,13 +1,42 @@
+import sys
 import time
+import json
+import os
+import argparse
+import subprocess
 import threading
 import math
 import numpy as np
-import matplotlib.pyplot as plt
-from pynput import keyboard
-from collections import deque
 from dynamixel_sdk import *
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from robotModuleFunctions import *
+from simulatedDynamixel import SimulatedPortHandler, SimulatedPacketHandler
+from tdLearners import Horde, HordeTDLambda, HordeIDBD
+from telemetry import TelemetryWriter
+from predictionMetrics import StreamingErrors, Rupee
+from returnVerifier import StreamingVerifier
+from tileCoding import TileCoder
+from sensorLog import SensorRecorder
+from loopScheduler import FixedRateScheduler
+from stageTimers import StageTimers, TimedPacketHandler
+from busWorker import BusWorker, SAFETY
+from learnerCheckpoint import CheckpointWriter, IncrementalCopy, load_checkpoint
+
+parser = argparse.ArgumentParser(description="Learn a constant-gamma load prediction on the gripper.")
+parser.add_argument('--sim', action='store_true', help="Run against the simulated Dynamixel bus instead of COMM_PORT")
+parser.add_argument('--log', metavar='PATH', help="Record every snapshot to a binary sensor log")
+parser.add_argument('--rate', type=float, default=100, help="Learning loop rate in Hz (default: 100)")
+parser.add_argument('--timing-dump', metavar='PATH', help="Save per-stage latency histograms as JSON on shutdown")
+parser.add_argument('--headless', action='store_true', help="No viewer window or keyboard controls; stop with Ctrl+C or --duration")
+parser.add_argument('--telemetry', metavar='NAME',
+                    help="Shared-memory telemetry buffer that viewers attach to (default: module2_telemetry_<pid>)")
+parser.add_argument('--duration', type=float, metavar='SECONDS', help="Stop after this many seconds")
+parser.add_argument('--checkpoint', metavar='PATH', help="Warm start the learner from PATH if it exists, and save it there periodically and on shutdown")
+args = parser.parse_args()
+
+# The keyboard front-end (and its import) loads only when enabled; plotting runs in telemetryViewer.py
+if not args.headless:
+    from pynput import keyboard
 
 # --- Configuration -----------------------------------------------------------------------
 # Motor communication:
@@ -36,6 +65,11 @@ class MotorMovement:
     HAND_POS_2: int = 2650
     POS_RANGE = HAND_POS_2 - HAND_POS_1
     WAIT_TIME = math.ceil(((POS_RANGE) / (4096 * 0.229 * MOTOR_VELO)) * 60)
+    # A half-cycle ends as soon as the hand arrives or stalls; WAIT_TIME only bounds it
+    ARRIVE_TOLERANCE: int = 20  # Position counts from the goal that count as arrived
+    STILL_VELOCITY: int = 1     # Velocity at or below which the hand counts as stopped
+    STALL_TIME: float = 0.3     # Seconds stopped short of the goal before giving up on it
+    MOVE_TIMEOUT = 2 * WAIT_TIME
 
 # Learning parameters:
 @dataclass
@@ -45,200 +79,360 @@ class LearningParams:
     NUM_POS_BINS: int = 10   # For creating feature vector
     NUM_VEL_BINS: int = 20    # For creating feature vector
     GAMMA: float = 0.5         # Discount factor 
-    ALPHA: float = 1         # Learning rate
+    ALPHA: float = 1         # Learning rate (the initial one with adaptive step sizes)
+    STEP_SIZES: str = 'fixed'  # 'fixed' (ALPHA throughout), or per-feature step sizes adapted by 'idbd' or 'autostep'
+    META_STEP: float = 0.1   # Step size of the step-size adaptation
+    AUTOSTEP_TAU: float = 1e4  # Autostep's normalizer time scale in steps
+    LAMBDA: float = 0.0      # Trace decay; > 0 learns with TD(lambda) instead of TD(0)
+    TRUE_ONLINE: bool = False  # Use true online TD(lambda) (dutch traces)
+    TRACE_THRESHOLD: float = 1e-4  # Traces below this are dropped
+    HORDE_GAMMAS: tuple = (GAMMA, 0.8, 0.9, 0.95, 0.99)  # Time scales learned for every cumulant
+    HORDE_LOAD_THRESHOLDS: tuple = (LOAD_THRESHOLD, 50, 200)  # Hand load thresholds (cumulants)
+    POS_TOLERANCE: int = 50   # Position-target cumulants fire within this many counts
+    FEATURES: str = 'grid'    # 'grid' (one-hot pos x vel bins) or 'tiles' (tile coding)
+    TILE_INPUTS: tuple = ('pos', 'vel')  # Hand signals fed to the tile coder ('pos', 'vel', 'load')
+    TILES_PER_DIM: int = 8
+    NUM_TILINGS: int = 8
+    TILE_HASH_SIZE: int = 4096  # None to give every tile its own feature
+    ERROR_DECAY: float = 0.999  # Exponential weighting of the running error (~1000 step memory)
+    RUPEE_ALPHA: float = 0.1    # RUPEE's h step size (split across active features like ALPHA)
+    RUPEE_BETA: float = 0.001   # RUPEE's averaging rate
 
 motorAddresses = MotorAddresses()
 motorMovement = MotorMovement()
 learningParams = LearningParams()
 
-verifier_buffer_length = math.ceil(5*(1/(1-learningParams.GAMMA)))  # Number of steps to look back at for verification
-verifier_indices = np.arange(verifier_buffer_length)    # Create an array of indices [0, 1, 2, ..., verifier_buffer_length-1]
-w = np.zeros(learningParams.NUM_POS_BINS * learningParams.NUM_VEL_BINS)  # Weight vector initialization
-x_prev = np.zeros(learningParams.NUM_POS_BINS * learningParams.NUM_VEL_BINS, dtype=int)  # Previous feature vector
-
-# Plotting:
-WINDOW_SIZE = 200 # How many points to show on the screen
-pos_history = deque([2048] * WINDOW_SIZE, maxlen=WINDOW_SIZE)
-vel_history = deque([0] * WINDOW_SIZE, maxlen=WINDOW_SIZE)
-load_history = deque([0] * WINDOW_SIZE, maxlen=WINDOW_SIZE)
-cumulant_history = deque([0] * WINDOW_SIZE, maxlen=WINDOW_SIZE)
-pred_history = deque([0] * WINDOW_SIZE, maxlen=WINDOW_SIZE)
-verifier_history = deque([np.nan] * WINDOW_SIZE, maxlen=WINDOW_SIZE)
+HAND_IDX = MOTOR_IDS.index(motorMovement.HAND_ID)
+
+# Horde of GVFs: hand load thresholds, per-joint loads and hand position targets, each at every gamma
+cumulants = ([make_load_threshold_cumulant(HAND_IDX, threshold) for threshold in learningParams.HORDE_LOAD_THRESHOLDS]
+             + [make_load_cumulant(i, learningParams.MAX_LOAD) for i in range(len(MOTOR_IDS))]
+             + [make_position_cumulant(HAND_IDX, target, learningParams.POS_TOLERANCE)
+                for target in (motorMovement.HAND_POS_1, motorMovement.HAND_POS_2)])
+cumulant_names = ([f"Hand |load| > {threshold}" for threshold in learningParams.HORDE_LOAD_THRESHOLDS]
+                  + [f"Motor {m_id} load" for m_id in MOTOR_IDS]
+                  + [f"Hand at {target}" for target in (motorMovement.HAND_POS_1, motorMovement.HAND_POS_2)])
+if learningParams.FEATURES == 'tiles':
+    input_ranges = {'pos': (motorMovement.HAND_POS_1, motorMovement.HAND_POS_2),
+                    'vel': (-motorMovement.MOTOR_VELO, motorMovement.MOTOR_VELO),
+                    'load': (-learningParams.MAX_LOAD, learningParams.MAX_LOAD)}
+    tileCoder = TileCoder([input_ranges[name][0] for name in learningParams.TILE_INPUTS],
+                          [input_ranges[name][1] for name in learningParams.TILE_INPUTS],
+                          learningParams.TILES_PER_DIM, learningParams.NUM_TILINGS, learningParams.TILE_HASH_SIZE)
+    num_features, num_active = tileCoder.num_features, tileCoder.num_tilings
+    tile_input = np.zeros(len(learningParams.TILE_INPUTS))
+else:
+    tileCoder = None
+    num_features, num_active = learningParams.NUM_POS_BINS * learningParams.NUM_VEL_BINS, 1
+# ALPHA is split across the active features so the effective step size doesn't depend on k
+if learningParams.STEP_SIZES != 'fixed':
+    if learningParams.LAMBDA > 0:
+        raise ValueError("Adaptive step sizes are implemented for TD(0) only; set LAMBDA = 0")
+    learner = HordeIDBD(num_features, learningParams.HORDE_GAMMAS, cumulants, learningParams.ALPHA / num_active,
+                        learningParams.META_STEP, num_active, learningParams.STEP_SIZES == 'autostep', learningParams.AUTOSTEP_TAU)
+elif learningParams.LAMBDA > 0:
+    learner = HordeTDLambda(num_features, learningParams.HORDE_GAMMAS, cumulants, learningParams.ALPHA / num_active,
+                            learningParams.LAMBDA, num_active, learningParams.TRUE_ONLINE, learningParams.TRACE_THRESHOLD)
+else:
+    learner = Horde(num_features, learningParams.HORDE_GAMMAS, cumulants, learningParams.ALPHA / num_active, num_active)
+MAIN_GVF = 0  # Hand load > LOAD_THRESHOLD at GAMMA, the prediction shown on the plot
+
+# Checkpoints: everything that decides what a weight means. A checkpoint only warm starts a learner
+# with the same layout (TD(0) and TD(lambda) checkpoints are interchangeable).
+CHECKPOINT_INTERVAL = 30  # Seconds between background saves
+checkpoint_layout = {'features': learningParams.FEATURES, 'num_features': num_features, 'num_active': num_active,
+                     'gammas': learningParams.HORDE_GAMMAS, 'motor_ids': MOTOR_IDS,
+                     'cumulants': {'HORDE_LOAD_THRESHOLDS': learningParams.HORDE_LOAD_THRESHOLDS,
+                                   'MAX_LOAD': learningParams.MAX_LOAD, 'POS_TOLERANCE': learningParams.POS_TOLERANCE,
+                                   'HAND_POS': (motorMovement.HAND_POS_1, motorMovement.HAND_POS_2)}}
+if tileCoder is not None:
+    checkpoint_layout.update(TILE_INPUTS=learningParams.TILE_INPUTS, TILES_PER_DIM=learningParams.TILES_PER_DIM,
+                             NUM_TILINGS=learningParams.NUM_TILINGS, TILE_HASH_SIZE=learningParams.TILE_HASH_SIZE,
+                             input_ranges=input_ranges)
+else:
+    checkpoint_layout.update(NUM_POS_BINS=learningParams.NUM_POS_BINS, NUM_VEL_BINS=learningParams.NUM_VEL_BINS,
+                             MOTOR_VELO=motorMovement.MOTOR_VELO)
+checkpoint_layout = json.loads(json.dumps(checkpoint_layout))  # Tuples -> lists, to compare with saved layouts
+
+def checkpoint_metadata():
+    return {'layout': checkpoint_layout, 'learner': type(learner).__name__,
+            'learning_params': asdict(learningParams), 'steps': learner.steps, 'saved_at': time.time()}
+
+if args.checkpoint and os.path.exists(args.checkpoint):
+    saved_state, saved_metadata = load_checkpoint(args.checkpoint)
+    if saved_metadata['layout'] != checkpoint_layout:
+        # Saving to the same path would overwrite it, so don't start rather than ignore it
+        raise SystemExit(f"{args.checkpoint} was saved with a different feature layout; "
+                         f"pass a new --checkpoint path to start a fresh learner")
+    learner.load_state(saved_state)
+    learner.reset_episode()  # The time between sessions isn't a transition
+    print(f"Warm started from {args.checkpoint} ({saved_metadata['learner']}, {learner.steps} steps)")
+    del saved_state
+checkpointWriter = CheckpointWriter(args.checkpoint) if args.checkpoint else None
+stateCopy = IncrementalCopy(learner)  # Spreads copying the weights for a checkpoint over several steps
+x_active = np.zeros(num_active, dtype=np.intp)  # Active feature indices of the current state
+# Delayed true returns of every GVF (normalized like the predictions) for verification
+verifier = StreamingVerifier(learner.gammas, normalize=True)
+# Running prediction quality of every GVF: error against the verifier, and RUPEE (no verifier needed)
+errors = StreamingErrors(learner.num_gvfs, learningParams.ERROR_DECAY)
+rupee = Rupee(num_features, learner.num_gvfs, learningParams.RUPEE_ALPHA / num_active, learningParams.RUPEE_BETA, num_active)
+
+# Telemetry: every learning step is published to shared memory for viewers in other processes
+TELEMETRY_CAPACITY = 4096  # Steps kept in the ring; must exceed the longest verifier horizon to show all returns
+gvf_labels = [f"{name}, gamma {gamma}" for name in cumulant_names for gamma in learningParams.HORDE_GAMMAS]
+telemetry_name = args.telemetry or f"module2_telemetry_{os.getpid()}"  # Per process, so two learners never share one
+telemetry = TelemetryWriter(telemetry_name, len(MOTOR_IDS), learner.num_gvfs, TELEMETRY_CAPACITY,
+                            metadata={'motor_ids': MOTOR_IDS, 'hand_id': motorMovement.HAND_ID, 'hand_idx': HAND_IDX,
+                                      'main_gvf': MAIN_GVF, 'gammas': learner.gammas.tolist(), 'gvf_labels': gvf_labels})
+print(f"Telemetry buffer: {telemetry_name} (view it with: python telemetryViewer.py {telemetry_name})")
 
 # Misc:
+SHED_MARGIN = 0.001  # Skip logging when less than this many seconds are left before the next deadline
+scheduler = FixedRateScheduler(args.rate)
+timers = StageTimers()  # Latency histograms per loop stage and bus transaction (press T for a summary)
 avg_update_time = 0
 loop_count = 0
 is_paused = False  # Global pause flag
+goal_positions = np.array([INITIAL_POSITIONS[m_id] for m_id in MOTOR_IDS], dtype=np.int32)  # Last commanded goals
 running = True # Control flag to stop threads
+# Detects the end of each gripper move from the learner's snapshots (no extra bus traffic)
+motionMonitor = MotionMonitor(HAND_IDX, motorMovement.ARRIVE_TOLERANCE, motorMovement.STILL_VELOCITY, motorMovement.STALL_TIME)
+cycle_count = 0  # Completed close/open cycles
+cycle_start = None
+
+# Move the hand and wait until it arrives, stalls or times out
+def move_hand(goal):
+    goal_positions[HAND_IDX] = goal
+    motionMonitor.start_move(goal)
+    bus.write4(motorMovement.HAND_ID, motorAddresses.GOAL_POSITION, goal)  # Queued on the bus worker
+    return motionMonitor.wait(motorMovement.MOVE_TIMEOUT)
 
 # Background thread to move the gripper:
 def move_logic():
     # This function runs in the background to cycle the hand.
-    global running
+    global running, cycle_count, cycle_start
+    cycle_start = time.perf_counter()
     while running:
         if is_paused:
             time.sleep(0.1)
             continue
         # Move to Close
-        packetHandler.write4ByteTxRx(portHandler, motorMovement.HAND_ID, motorAddresses.GOAL_POSITION, motorMovement.HAND_POS_1)
-        time.sleep(motorMovement.WAIT_TIME)
-        # Move to Open
-        packetHandler.write4ByteTxRx(portHandler, motorMovement.HAND_ID, motorAddresses.GOAL_POSITION, motorMovement.HAND_POS_2)
-        time.sleep(motorMovement.WAIT_TIME)
+        move_hand(motorMovement.HAND_POS_1)
+        if not running or is_paused:
+            continue
+        # Move to Open; only a cycle that ends open, unpaused, counts towards the cycle rate
+        if move_hand(motorMovement.HAND_POS_2) == 'arrived' and running and not is_paused:
+            cycle_count += 1
+
+def metrics_report():
+    lines = [f"{'GVF':<40}{'verified':>9}{'RMSE':>8}{'EW RMSE':>9}{'RUPEE':>8}"]
+    rmse, ew_rmse, rupee_value = np.sqrt(errors.mse), np.sqrt(errors.ewmse), rupee.value * (1 - learner.gammas)
+    for k, label in enumerate(gvf_labels):
+        lines.append(f"{label:<40}{errors.count[k]:>9}{rmse[k]:>8.3f}{ew_rmse[k]:>9.3f}{rupee_value[k]:>8.3f}")
+    return "\n".join(lines)
+
+def cycle_report():
+    minutes = (time.perf_counter() - cycle_start) / 60 if cycle_start is not None else 0
+    rate = cycle_count / minutes if minutes > 0 else 0
+    counts = motionMonitor.counts
+    return (f"Gripper: {cycle_count} cycles in {minutes:.1f} min ({rate:.1f} cycles/min); moves "
+            f"{counts['arrived']} arrived, {counts['stalled']} stalled, {counts['timeout']} timed out")
 
 # Kayboard listener for pausing/resuming
 def on_press(key):
     global is_paused
+    if hasattr(key, 'char') and key.char == 't':
+        print("\n" + timers.report())
+        print(cycle_report())
+        print(metrics_report())
     if key == keyboard.Key.space:
         is_paused = not is_paused
         status = "PAUSED" if is_paused else "RESUMED"
         print(f"\n*** {status} ***")
         if is_paused:
-            # Tell motor to stop exactly where it is immediately
-            pos, _, _ = packetHandler.read4ByteTxRx(portHandler, motorMovement.HAND_ID, motorAddresses.PRESENT_POSITION)
-            packetHandler.write4ByteTxRx(portHandler, motorMovement.HAND_ID, motorAddresses.GOAL_POSITION, pos)
+            # Tell motor to stop exactly where it is immediately (ahead of anything else queued)
+            bus.submit(SAFETY, stop_hand)
+
+# Hold the hand at its present position. Runs on the bus worker, so the read and write go out back to back.
+def stop_hand(packetHandler, portHandler):
+    pos, result, _ = packetHandler.read4ByteTxRx(portHandler, motorMovement.HAND_ID, motorAddresses.PRESENT_POSITION)
+    if result == COMM_SUCCESS:
+        goal_positions[HAND_IDX] = pos
+        packetHandler.write4ByteTxRx(portHandler, motorMovement.HAND_ID, motorAddresses.GOAL_POSITION, pos)
 
 # --- Communitcation and Motor Setup ------------------------------------------------------
-portHandler = PortHandler(COMM_PORT)
-packetHandler = PacketHandler(PROTOCOL_VERSION)
+if args.sim:
+    # Object held in the gripper part way between HAND_POS_2 (open) and HAND_POS_1 (closed)
+    SIM_OBJECT_POS = motorMovement.HAND_POS_1 + motorMovement.POS_RANGE // 4
+    portHandler = SimulatedPortHandler(COMM_PORT, MOTOR_IDS, INITIAL_POSITIONS, obstacles={motorMovement.HAND_ID: SIM_OBJECT_POS})
+    packetHandler = SimulatedPacketHandler(PROTOCOL_VERSION)
+else:
+    portHandler = PortHandler(COMM_PORT)
+    packetHandler = PacketHandler(PROTOCOL_VERSION)
+packetHandler = TimedPacketHandler(packetHandler, timers)
 
 if not portHandler.openPort() or not portHandler.setBaudRate(BAUDRATE):
     print("Failed to open port. Check connection!")
     quit()
 
-for m_id in MOTOR_IDS:
-    # Enable Torque
-    packetHandler.write1ByteTxRx(portHandler, m_id, motorAddresses.TORQUE_ENABLE, 1)
-    # Set Speed (Profile Velocity)
-    packetHandler.write4ByteTxRx(portHandler, m_id, motorAddresses.PROFILE_VELOCITY, motorMovement.MOTOR_VELO)
-    # Move to Initial Position
-    packetHandler.write4ByteTxRx(portHandler, m_id, motorAddresses.GOAL_POSITION, INITIAL_POSITIONS[m_id])
+# One GroupSyncWrite packet per command sets every motor at once
+jointCommander = JointCommander(packetHandler, portHandler, MOTOR_IDS, motorAddresses.PROFILE_VELOCITY,
+                                motorAddresses.GOAL_POSITION, motorAddresses.TORQUE_ENABLE)
+# Enable Torque
+jointCommander.torque(True)
+# Set Speed (Profile Velocity) and move to Initial Position
+jointCommander.write(goal_positions, motorMovement.MOTOR_VELO)
 print("Robot Ready.")
 
+# One GroupSyncRead transaction per step reads pos/vel/load for every motor
+snapshotReader = SnapshotReader(packetHandler, portHandler, MOTOR_IDS, motorAddresses.PRESENT_LOAD,
+                                motorAddresses.PRESENT_VELOCITY, motorAddresses.PRESENT_POSITION)
+
+# From here on only the bus worker talks to the port; other threads queue jobs on it
+bus = BusWorker(packetHandler, portHandler, snapshotReader)
+bus.start()
 
 # Start the threads
-listener = keyboard.Listener(on_press=on_press)
-listener.start()
+if not args.headless:
+    listener = keyboard.Listener(on_press=on_press)
+    listener.start()
 mover = threading.Thread(target=move_logic, daemon=True)
 mover.start()
 
-# --- Live Plotting Setup -----------------------------------------------------------------
-plt.ion()
-fig, axs = plt.subplots(3, 1, figsize=(10, 6))
-
-# Axis 1: Present Position (top plot, left axis)
-axs[0].set_xlabel('Time (Samples)')
-axs[0].set_ylabel('Motor Position (0-4095)', color='blue')
-line_pos, = axs[0].plot(list(pos_history), color='blue', label='Position')
-axs[0].tick_params(axis='y', labelcolor='blue')
-axs[0].set_ylim(0, 4095)
-
-# Axis 2: Present Velocity (top plot, right axis)
-axs0_left = axs[0].twinx() # This creates the second Y-axis
-axs0_left.set_ylabel('Velocity', color='green')
-line_vel, = axs0_left.plot(list(vel_history), color='green', alpha=0.6, label='Velocity')
-axs0_left.tick_params(axis='y', labelcolor='green')
-axs0_left.set_ylim(-100, 100)
-
-# Axis 3: Present Load (middle plot)
-axs[1].set_ylabel('Raw Load (0-2000)', color='red')
-line_load, = axs[1].plot(list(load_history), color='red', alpha=0.6, label='Load')
-axs[1].tick_params(axis='y', labelcolor='red')
-axs[1].set_ylim(-400, 400) 
-
-# Axis 4: Normalized load and prediction (Bottom plot)
-axs[2].set_ylabel('Cumulant Signal / Prediction', color='purple')
-line_c, = axs[2].plot(list(cumulant_history), color='orange', alpha=0.6, label='Cumulant Signal')
-line_pred, = axs[2].plot(list(pred_history), color='purple', alpha=0.6, label='Prediction')
-line_verifier, = axs[2].plot(list(verifier_history), color='brown', alpha=0.6, label='Verifier')
-axs[2].tick_params(axis='y', labelcolor='purple')
-axs[2].set_ylim(-0.5, 1.5)
-
-fig.tight_layout()
-axs[0].grid(True, alpha=0.3)
-plt.title(f"Motor {motorMovement.HAND_ID}: Position, Velocity, and Load")
-
-print("Starting live plot. Close the window to stop.")
-
 # -----------------------------------------------------------------------------------------
 # --- Main Loop  --------------------------------------------------------------------------
 # -----------------------------------------------------------------------------------------
-try:
-    while plt.fignum_exists(fig.number):
-        start_time = time.perf_counter()
+# Runs in a background thread on the scheduler's fixed period and publishes each step to `telemetry`
+def learning_loop():
+    global avg_update_time, loop_count
+    next_checkpoint = time.perf_counter() + CHECKPOINT_INTERVAL
+    scheduler.start()
+    while running:
+        scheduler.wait()
+        start_time = lap = time.perf_counter()
+
+        # Read actual position, velocity, and load from all motors in one packet
+        snapshot = bus.snapshot().result()
+        lap = timers.lap('read', lap)
+        if snapshot is None:
+            continue
+        pos_all, vel_all, load_all = snapshot
+        motionMonitor.update(start_time, pos_all, vel_all)
+
         if is_paused:
-            # Still flush events - allows the window to process the "Close" click
-            fig.canvas.flush_events()
-            time.sleep(0.1)
+            if recorder is not None and not scheduler.should_shed(SHED_MARGIN):
+                recorder.record(start_time - run_start, pos_all, vel_all, load_all, goal_positions, True)
             continue
+        pos, vel, load = int(pos_all[HAND_IDX]), int(vel_all[HAND_IDX]), int(load_all[HAND_IDX])
+
+        # Covert pos and vel into the active feature index
+        if tileCoder is not None:
+            signals = {'pos': pos, 'vel': vel, 'load': load}
+            tile_input[:] = [signals[name] for name in learningParams.TILE_INPUTS]
+            tileCoder.active_indices(tile_input, out=x_active)
+        else:
+            x_active[0] = feature_index(pos, vel, motorMovement, learningParams)
+        lap = timers.lap('featurize', lap)
+
+        # Convert the snapshot into every GVF's signal of interest (cumulants)
+        c_all = learner.cumulant(pos_all, vel_all, load_all)
+        lap = timers.lap('cumulant', lap)
+
+        # TD update of all GVFs' active (or traced) weights (also stores the state for the next step)
+        delta = learner.update(x_active, c_all)
+        lap = timers.lap('td_update', lap)
+        rupee.update(x_active, delta)
+        lap = timers.lap('rupee', lap)
+
+        # Calculate predictions
+        preds = learner.predict(x_active) * (1-learner.gammas)
+        lap = timers.lap('predict', lap)
 
-        # Read actual position, velocity, and load from the motor
-        pos, vel, load = read_from_motor(packetHandler, portHandler, motorMovement.HAND_ID, motorAddresses)
-        if pos is not None:
-            pos_history.append(pos)  
-            vel_history.append(vel)  
-            load_history.append(load)
-
-        # Covert pos and vel into feature vector
-        x = featurize(pos, vel, motorMovement, learningParams)
-
-        # Convert load into signal of interest (cumulant)
-        c = cumulant_loadThreshold(load, learningParams.LOAD_THRESHOLD)
-        cumulant_history.append(c)
-
-        # Calculate delta
-        delta = c + learningParams.GAMMA*w@x - w@x_prev
- 
-        # Update W
-        w = w + learningParams.ALPHA*delta*x_prev
-
-        # Store state
-        x_prev = x
-
-        # Calculate prediction
-        pred = w@x * (1-learningParams.GAMMA)
-        pred_history.append(pred) # This might be updating the wrong index, need to think about it more
-
-        # Update plot lines
-        line_pos.set_ydata(list(pos_history))
-        line_vel.set_ydata(list(vel_history))
-        line_load.set_ydata(list(load_history))
-        line_c.set_ydata(list(cumulant_history))
-        line_pred.set_ydata(list(pred_history))
-        
-        # Refresh the plot
-        fig.canvas.draw()
-        fig.canvas.flush_events()
-        
-        time.sleep(0.01) # Small delay to control update rate
         end_time = time.perf_counter()
         elapsed_time = end_time - start_time
         avg_update_time = avg_update_time + (elapsed_time - avg_update_time) / (loop_count + 1)
         loop_count += 1
         # if loop_count % 50 == 0:
         #     print(f"Avg Loop Time: {avg_update_time:.4f} sec")
-        #     print(w)
-
-        if loop_count > verifier_buffer_length:
-            # First push a nan onto the end of verifier history
-            verifier_history.append(np.nan)
-            # Compute expected prediction for verifier_buffer_length steps in the past:
-            verifier_buffer = list(cumulant_history)[-verifier_buffer_length:]
-            expected_pred = np.sum(verifier_buffer * (learningParams.GAMMA ** verifier_indices)) * (1-learningParams.GAMMA)
-            verifier_history[-(verifier_buffer_length+1)] = expected_pred
-            line_verifier.set_ydata(list(verifier_history))
-
-
+        #     print(learner.w)
+
+        # True return for the predictions made horizon steps in the past (each GVF has its own horizon):
+        pred_delayed, return_delayed = verifier.update(c_all, preds)
+        lap = timers.lap('verifier', lap)
+        errors.update(pred_delayed, return_delayed)
+        lap = timers.lap('metrics', lap)
+
+        # RUPEE is in units of delta (unnormalized returns), so scale it like the predictions
+        telemetry.publish(start_time - run_start, pos_all, vel_all, load_all, c_all, preds,
+                          np.sqrt(errors.ewmse), rupee.value * (1 - learner.gammas))
+        telemetry.set_past('verifier', verifier.horizons + 1, return_delayed)
+        lap = timers.lap('telemetry', lap)
+
+        # Optional work, skipped when the next deadline is too close
+        if recorder is not None and not scheduler.should_shed(SHED_MARGIN):
+            recorder.record(start_time - run_start, pos_all, vel_all, load_all, goal_positions, False)
+            lap = timers.lap('log', lap)
+        # Only steps with checkpoint work to do ask the scheduler, so idle steps don't count as shed
+        if (checkpointWriter is not None and (stateCopy.active or start_time >= next_checkpoint)
+                and not scheduler.should_shed(SHED_MARGIN)):
+            if not stateCopy.active:
+                stateCopy.start()
+            state = stateCopy.step()
+            if state is not None:  # Copy finished: saved in the background
+                checkpointWriter.submit(state, checkpoint_metadata())
+                next_checkpoint = start_time + CHECKPOINT_INTERVAL
+            lap = timers.lap('checkpoint', lap)
+        timers.record('step', lap - start_time)
+
+# Snapshots (including while paused) go to the log, timestamped from here; logging is skipped on
+# steps where the loop is over budget (less than SHED_MARGIN left before the next deadline). The
+# timestamps show where steps are missing; replayTrainer.py splits the stream there.
+recorder = SensorRecorder(args.log, MOTOR_IDS) if args.log else None
+run_start = time.perf_counter()
+learner_thread = threading.Thread(target=learning_loop, daemon=True)
+learner_thread.start()
+stop_time = time.perf_counter() + args.duration if args.duration is not None else None
+def keep_running():
+    return running and (stop_time is None or time.perf_counter() < stop_time)
+try:
+    if args.headless:
+        print("Running headless. Press Ctrl+C to stop.")
+        while keep_running():
+            time.sleep(0.1)
+    else:
+        print("Starting the telemetry viewer. Close its window to stop.")
+        viewer = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetryViewer.py'),
+                                   telemetry_name, '--gvf', str(MAIN_GVF)])
+        while keep_running() and viewer.poll() is None:
+            time.sleep(0.1)
 except KeyboardInterrupt:
     pass
 
 # --- Cleanup ---
 print("\nShutting down...")
 running = False
+learner_thread.join()
+bus.stop()
+telemetry.close()  # Viewers see the buffer closed and exit
+if checkpointWriter is not None:
+    checkpointWriter.submit(learner.state(), checkpoint_metadata())
+    checkpointWriter.close()
+    if checkpointWriter.error is not None:
+        print(f"Failed to save the learner checkpoint to {args.checkpoint}: {checkpointWriter.error}")
+    else:
+        print(f"Learner checkpoint saved to {args.checkpoint} ({learner.steps} steps)")
+print(scheduler.report())
+print(timers.report())
+print(cycle_report())
+print(metrics_report())
+if args.timing_dump:
+    timers.dump(args.timing_dump)
+    print(f"Timing histograms saved to {args.timing_dump}")
+if recorder is not None:
+    recorder.close()
+    print(f"Sensor log saved to {args.log}")
 # Disable torque before closing so you can move the arm by hand
-for m_id in MOTOR_IDS:
-    packetHandler.write1ByteTxRx(portHandler, m_id, motorAddresses.TORQUE_ENABLE, 0)
+jointCommander.torque(False)
 portHandler.closePort()
 print("Communication Closed.")
-portHandler.closePort()
-plt.close()
\ No newline at end of file
+portHandler.closePort()
\ No newline at end of file
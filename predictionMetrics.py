@@ -0,0 +1,101 @@
+import numpy as np
+
+# --- Streaming Prediction Metrics --------------------------------------------------------
+# Constant-time, constant-memory error measures for a Horde, vectorized across GVFs, so long
+# runs can be scored without keeping histories.
+
+# Error of each GVF's prediction against its delayed true return (StreamingVerifier output):
+# the MSE over every verified step, and an exponentially weighted MSE that tracks the recent
+# error (bias-corrected, so it is unbiased from the first verified step on).
+class StreamingErrors:
+    def __init__(self, num_gvfs, decay=0.999):
+        self.decay = decay
+        self.count = np.zeros(num_gvfs, dtype=np.int64)  # Verified steps per GVF
+        self.sum_squared = np.zeros(num_gvfs)
+        self.ew_squared = np.zeros(num_gvfs)
+        self.ew_weight = np.zeros(num_gvfs)  # Total weight in ew_squared, for the bias correction
+        self.squared = np.zeros(num_gvfs)
+        self.valid = np.zeros(num_gvfs, dtype=bool)
+
+    # NaN entries (GVFs whose horizon hasn't passed yet) are skipped
+    def update(self, prediction, true_return):
+        np.subtract(prediction, true_return, out=self.squared)
+        np.isfinite(self.squared, out=self.valid)
+        self.squared[~self.valid] = 0
+        self.squared **= 2
+        self.count += self.valid
+        self.sum_squared += self.squared
+        keep = np.where(self.valid, self.decay, 1.0)
+        self.ew_squared *= keep
+        self.ew_squared += (1 - keep) * self.squared
+        self.ew_weight *= keep
+        self.ew_weight += 1 - keep
+
+    @property
+    def mse(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.sum_squared / self.count, np.nan)
+
+    @property
+    def ewmse(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.ew_weight > 0, self.ew_squared / self.ew_weight, np.nan)
+
+# RUPEE (White 2015, "Developing a Predictive Approach to Knowledge"): an estimate of each GVF's
+# root projected Bellman error that needs no true returns,
+#     RUPEE = sqrt(|h . avg(delta*e)|),    h += alpha_h * (delta*e - (h.x)*x),
+# where avg() is an unbiased exponential average with rate beta0. Traces are taken as e = x
+# (the TD(0) Horde's update direction). With binary features given as active indices, only the
+# active rows of h and avg(delta*e) change: the decay of the average is kept as one scale
+# factor and h.avg(delta*e) is updated incrementally, so a step costs O(active x GVFs).
+class Rupee:
+    def __init__(self, num_features, num_gvfs, alpha_h, beta0=0.001, num_active=1):
+        self.alpha_h = alpha_h
+        self.beta0 = beta0
+        # Feature-major, like Horde.WT, so the rows of the active features are contiguous
+        self.H = np.zeros((num_features, num_gvfs))
+        self.D = np.zeros((num_features, num_gvfs))  # avg(delta*e) / scale
+        self.scale = 1.0
+        self.tau = 0.0
+        self.h_dot_d = np.zeros(num_gvfs)  # Sum over features of H * D
+        self.x_prev = np.zeros(num_active, dtype=np.intp)
+        self.has_prev = False
+
+    # Call with every step's active indices and the learner's TD errors for the transition
+    # into them (what Horde.update returns); delta belongs to the previous state's features
+    def update(self, active, delta):
+        if self.has_prev:
+            self._step(self.x_prev, delta)
+        self.x_prev[:] = active
+        self.has_prev = True
+
+    def _step(self, active, delta):
+        features, counts = np.unique(active, return_counts=True)  # Hash collisions count twice in x
+        self.tau = (1 - self.beta0) * self.tau + self.beta0
+        beta = self.beta0 / self.tau
+
+        # avg(delta*e) = (1 - beta)*avg + beta*delta*x, with the decay folded into the scale
+        self.scale *= 1 - beta
+        if self.scale < 1e-12:
+            self._rescale()
+        change = (beta / self.scale) * counts[:, None] * delta
+        self.h_dot_d += (self.H[features] * change).sum(axis=0)
+        self.D[features] += change
+
+        # h += alpha_h * (delta - h.x) * x
+        h_x = (self.H[features] * counts[:, None]).sum(axis=0)
+        change = self.alpha_h * counts[:, None] * (delta - h_x)
+        self.h_dot_d += (change * self.D[features]).sum(axis=0)
+        self.H[features] += change
+
+    # Fold the scale into D (O(features), once every ~log(1e12)/beta0 steps). On the first step
+    # (beta = 1) the scale is 0, which clears the average.
+    def _rescale(self):
+        self.D *= self.scale
+        self.scale = 1.0
+        # Recompute the running dot product exactly, so rounding errors don't accumulate
+        self.h_dot_d = np.einsum('ij,ij->j', self.H, self.D)
+
+    @property
+    def value(self):
+        return np.sqrt(np.abs(self.scale * self.h_dot_d))
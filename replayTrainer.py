@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from dataclasses import dataclass, asdict, replace
+from concurrent.futures import ProcessPoolExecutor
+from robotModuleFunctions import feature_indices, cumulant_loadThreshold_batch
+from tdLearners import SparseTD, HordeIDBD
+from returnVerifier import verifier_horizon
+from sensorLog import open_log, log_motor_ids, snapshot_records
+
+# --- Offline Replay Trainer --------------------------------------------------------------
+# Replays a recorded sensor log through the same featurize -> cumulant -> TD(0) pipeline as
+# module2_constantGamma.py, with no bus, sleeps or plotting, and sweeps a grid of settings
+# over a process pool. Features and cumulants of the whole log are computed up front with the
+# batch functions, so only the TD updates run step by step. Workers map the log read-only and read
+# the hand's samples through strided views of the map (no copies), so the OS shares its pages
+# between them; only the per-configuration features and cumulants are private to a worker.
+
+# One configuration of the pipeline. Doubles as the motorMovement/learningParams objects
+# that feature_indices expects. HAND_POS_*/MOTOR_VELO must match the recorded run.
+@dataclass(frozen=True)
+class ReplayConfig:
+    GAMMA: float = 0.5
+    ALPHA: float = 1
+    STEP_SIZES: str = 'fixed'  # 'fixed', or adapted per feature by 'idbd' or 'autostep' (ALPHA is the initial one)
+    META_STEP: float = 0.1
+    NUM_POS_BINS: int = 10
+    NUM_VEL_BINS: int = 20
+    LOAD_THRESHOLD: int = 100
+    HAND_POS_1: int = 1750
+    HAND_POS_2: int = 2650
+    MOTOR_VELO: int = 20
+
+# Hand samples of the log, set once per worker process
+_stream = None
+
+# Records further apart than this many loop periods have steps missing between them
+GAP_PERIODS = 1.5
+
+# Views of the hand's column of the mapped log, and the steps the live learner used (it skips
+# paused steps; they are dropped after featurizing, so the views stay views). The live loop sheds
+# logging when it is over budget and may miss deadlines, so steps can be missing from the log:
+# the kept steps are split into segments at every gap in t, given as the index of each
+# segment's first kept step.
+def load_stream(log_path, hand_id):
+    motor_ids = log_motor_ids(log_path)
+    hand = snapshot_records(open_log(log_path), len(motor_ids))[:, motor_ids.index(hand_id)]
+    keep = np.flatnonzero(hand['paused'] == 0)
+    dt = np.diff(hand['t'])
+    gaps_before = np.concatenate(([0], np.cumsum(dt > GAP_PERIODS * np.median(dt)))) if len(dt) else np.zeros(len(hand), dtype=int)
+    segment_starts = np.flatnonzero(np.diff(gaps_before[keep], prepend=-1))
+    return {'pos': hand['pos'], 'vel': hand['vel'], 'load': hand['load'], 'keep': keep, 'segment_starts': segment_starts}
+
+def _init_worker(log_path, hand_id):
+    global _stream
+    _stream = load_stream(log_path, hand_id)
+
+# Truncated discounted return G_t = sum_{k<L} gamma^k c_{t+1+k} for every t with a full window,
+# from the full return R_t = c_{t+1} + gamma*R_{t+1} as G_t = R_t - gamma^L * R_{t+L}
+def truncated_returns(c, gamma, horizon):
+    full = np.zeros(len(c))
+    running = 0.0
+    for t in range(len(c) - 2, -1, -1):
+        running = c[t + 1] + gamma * running
+        full[t] = running
+    num_valid = max(len(c) - horizon, 0)
+    return full[:num_valid] - gamma ** horizon * full[horizon:horizon + num_valid]
+
+# Replay one configuration. Errors compare normalized predictions with the normalized verifier return.
+def replay(config, stream=None, curve_points=50):
+    stream = _stream if stream is None else stream
+    keep = stream['keep']
+    num_steps = len(keep)
+    num_features = config.NUM_POS_BINS * config.NUM_VEL_BINS
+    if config.STEP_SIZES == 'fixed':
+        learner = SparseTD(num_features, config.GAMMA, config.ALPHA)
+    else:  # A Horde of one GVF; its cumulant comes from the batch cumulants below
+        learner = HordeIDBD(num_features, [config.GAMMA], [None], config.ALPHA, config.META_STEP,
+                            autostep=config.STEP_SIZES == 'autostep')
+    preds = np.zeros(num_steps)
+    start = time.perf_counter()
+    indices = feature_indices(stream['pos'], stream['vel'], config, config)[keep].tolist()
+    c = cumulant_loadThreshold_batch(stream['load'], config.LOAD_THRESHOLD)[keep]
+    cumulants = c.tolist()  # Python floats are cheaper to step through than NumPy scalars
+    segment_start = np.zeros(num_steps, dtype=bool)
+    segment_start[stream['segment_starts']] = True
+    segment_start = segment_start.tolist()
+    x_active = np.zeros(1, dtype=np.intp)
+    for t in range(num_steps):
+        if segment_start[t]:  # Steps are missing before this one: no transition to learn from
+            learner.reset_episode()
+        x_active[0] = indices[t]
+        learner.update(x_active, cumulants[t])
+        preds[t:t + 1] = learner.predict(x_active)  # A float from SparseTD, one value per GVF from a Horde
+    elapsed = time.perf_counter() - start
+
+    # Returns are computed per segment, so no verifier window reaches across missing steps
+    scale = 1 - config.GAMMA
+    horizon = verifier_horizon(config.GAMMA)
+    bounds = stream['segment_starts'].tolist() + [num_steps]
+    squared_error = [np.zeros(0)]
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        returns = truncated_returns(c[begin:end], config.GAMMA, horizon) * scale
+        squared_error.append((preds[begin:begin + len(returns)] * scale - returns) ** 2)
+    squared_error = np.concatenate(squared_error)
+    if len(squared_error) == 0:
+        curve, final_error = [], float('nan')
+    else:
+        curve = [float(np.sqrt(chunk.mean())) for chunk in np.array_split(squared_error, min(curve_points, len(squared_error)))]
+        final_error = float(np.sqrt(squared_error[-max(len(squared_error) // 10, 1):].mean()))  # RMSE over the last 10%
+    return {'config': asdict(config), 'steps': num_steps, 'segments': len(bounds) - 1, 'steps_per_sec': num_steps / elapsed if elapsed > 0 else float('inf'),
+            'final_rmse': final_error, 'rmse_curve': curve}
+
+# Every combination of the swept fields, on top of base
+def config_grid(base, grid):
+    names = list(grid)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*(grid[name] for name in names))]
+
+def sweep(log_path, hand_id, configs, workers=None):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_path, hand_id)) as pool:
+        return list(pool.map(replay, configs, chunksize=max(1, len(configs) // (4 * (workers or os.cpu_count() or 1)))))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a sensor log through the TD pipeline for a grid of settings.")
+    parser.add_argument('log', help="Sensor log recorded with module2_constantGamma.py --log")
+    parser.add_argument('--hand-id', type=int, default=5)
+    parser.add_argument('--gamma', type=float, nargs='+', default=[ReplayConfig.GAMMA])
+    parser.add_argument('--alpha', type=float, nargs='+', default=[ReplayConfig.ALPHA])
+    parser.add_argument('--step-sizes', nargs='+', default=[ReplayConfig.STEP_SIZES], choices=['fixed', 'idbd', 'autostep'])
+    parser.add_argument('--meta-step', type=float, nargs='+', default=[ReplayConfig.META_STEP])
+    parser.add_argument('--pos-bins', type=int, nargs='+', default=[ReplayConfig.NUM_POS_BINS])
+    parser.add_argument('--vel-bins', type=int, nargs='+', default=[ReplayConfig.NUM_VEL_BINS])
+    parser.add_argument('--load-threshold', type=int, nargs='+', default=[ReplayConfig.LOAD_THRESHOLD])
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--out', metavar='PATH', help="Write every result, including learning curves, as JSON")
+    args = parser.parse_args()
+
+    configs = config_grid(ReplayConfig(), {'GAMMA': args.gamma, 'ALPHA': args.alpha, 'STEP_SIZES': args.step_sizes,
+                                           'META_STEP': args.meta_step, 'NUM_POS_BINS': args.pos_bins,
+                                           'NUM_VEL_BINS': args.vel_bins, 'LOAD_THRESHOLD': args.load_threshold})
+    print(f"Replaying {args.log} for {len(configs)} configurations...")
+    start = time.perf_counter()
+    results = sweep(args.log, args.hand_id, configs, args.workers)
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+
+    results.sort(key=lambda r: (np.isnan(r['final_rmse']), r['final_rmse']))
+    print(f"{'GAMMA':>6} {'ALPHA':>6} {'STEPS':>9} {'META':>6} {'POS':>4} {'VEL':>4} {'LOAD':>5} {'RMSE':>8}")
+    for r in results[:20]:
+        cfg = r['config']
+        meta_step = cfg['META_STEP'] if cfg['STEP_SIZES'] != 'fixed' else '-'
+        print(f"{cfg['GAMMA']:>6} {cfg['ALPHA']:>6} {cfg['STEP_SIZES']:>9} {meta_step:>6} {cfg['NUM_POS_BINS']:>4} {cfg['NUM_VEL_BINS']:>4} "
+              f"{cfg['LOAD_THRESHOLD']:>5} {r['final_rmse']:>8.4f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Results saved to {args.out}")
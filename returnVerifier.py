@@ -0,0 +1,75 @@
+import math
+import numpy as np
+
+# --- Streaming Return Verifier -----------------------------------------------------------
+# Ground truth for GVF predictions: the discounted return over a fixed horizon of L steps,
+#     G_t = c_{t+1} + gamma*c_{t+2} + ... + gamma^(L-1)*c_{t+L},
+# available L steps after the prediction was made. Instead of re-summing the last L cumulants
+# every step, cumulants are grouped in blocks of L. The window ending now is the tail of the
+# previous block (suffix returns, computed once when that block filled) plus the head of the
+# current block (a running discounted prefix), so each step costs O(1) per GVF, amortized.
+
+# Default horizon: gamma^L is about e^-5, i.e. the truncated tail is below 1% of the return
+def verifier_horizon(gamma):
+    return math.ceil(5 * (1 / (1 - gamma)))
+
+class StreamingVerifier:
+    def __init__(self, gammas, horizons=None, normalize=False):
+        self.gammas = np.asarray(gammas, dtype=float)
+        self.num_gvfs = len(self.gammas)
+        if horizons is None:
+            horizons = [verifier_horizon(g) for g in self.gammas]
+        self.horizons = np.asarray(horizons, dtype=np.intp)
+        self.ring_size = int(self.horizons.max()) + 1
+        # Multiply returns by (1 - gamma) to compare with normalized predictions
+        self.scale = (1 - self.gammas) if normalize else np.ones(self.num_gvfs)
+        self.rows = np.arange(self.num_gvfs)
+        self.powers = self.gammas[:, None] ** np.arange(self.ring_size)  # gamma^k for k <= max horizon
+        self.block = np.zeros((self.num_gvfs, self.ring_size))  # Cumulants of the current block
+        self.suffix = np.zeros((self.num_gvfs, self.ring_size))  # Suffix returns of the previous block
+        self.prefix = np.zeros(self.num_gvfs)  # Discounted sum of the current block so far
+        self.position = np.zeros(self.num_gvfs, dtype=np.intp)  # Index in the current block
+        self.predictions = np.full((self.num_gvfs, self.ring_size), np.nan)  # Last max(L)+1 predictions
+        self.step_count = 0
+        # Aligned outputs of the latest step: prediction made L steps ago and its true return
+        self.delayed_prediction = np.full(self.num_gvfs, np.nan)
+        self.delayed_return = np.full(self.num_gvfs, np.nan)
+
+    # Feed this step's cumulants and predictions (one per GVF). Returns the aligned
+    # (prediction, return) pair for the step L in the past, NaN until L steps have passed.
+    def update(self, c, prediction):
+        rows, r, L = self.rows, self.position, self.horizons
+        self.block[rows, r] = c
+        self.prefix += self.powers[rows, r] * c
+        window_return = self.suffix[rows, r + 1] + self.powers[rows, L - 1 - r] * self.prefix
+
+        t = self.step_count
+        self.predictions[:, t % self.ring_size] = prediction
+        ready = t >= L
+        np.copyto(self.delayed_return, np.where(ready, window_return * self.scale, np.nan))
+        np.copyto(self.delayed_prediction, np.where(ready, self.predictions[rows, (t - L) % self.ring_size], np.nan))
+
+        # Blocks that just filled become the "previous block" of their GVF
+        full = r == L - 1
+        for g in np.flatnonzero(full):
+            self._close_block(g)
+        self.prefix[full] = 0
+        self.position += 1
+        self.position[full] = 0
+        self.step_count += 1
+        return self.delayed_prediction, self.delayed_return
+
+    # suffix[k] = sum_{i >= k} gamma^(i-k) c_i over the block, with suffix[L] = 0
+    def _close_block(self, g):
+        L, gamma = self.horizons[g], self.gammas[g]
+        block, powers = self.block[g, :L], self.powers[g, :L]
+        self.suffix[g, L] = 0
+        if powers[-1] > 1e-200:
+            # Summing from the tail keeps the small terms exact; dividing by gamma^k is bounded by gamma^-L
+            self.suffix[g, :L] = np.cumsum((powers * block)[::-1])[::-1] / powers
+        else:
+            # Very long horizons or gamma = 0: plain backward recursion
+            suffix = 0.0
+            for k in range(L - 1, -1, -1):
+                suffix = block[k] + gamma * suffix
+                self.suffix[g, k] = suffix
@@ -1,10 +1,9 @@
 import time
-import matplotlib.pyplot as plt
-from collections import deque
-from dynamixel_sdk import *
+import threading
 import math
 import numpy as np
-from pynput import keyboard
+# dynamixel_sdk is imported by the classes that talk to the bus, so offline tools (replay,
+# benchmarks) load without it
 
 # --- Function Definitions ----------------------------------------------------------------
 # Signed Conversions:
@@ -36,6 +35,133 @@ def read_from_motor(packetHandler, portHandler, motor_id, motorAddresses):
         load_signed = to_signed_16(load)    
     return pos, vel_signed, load_signed
 
+# Read position, velocity, and load from every motor with one GroupSyncRead packet.
+# PRESENT_LOAD (2 bytes), PRESENT_VELOCITY (4 bytes) and PRESENT_POSITION (4 bytes) sit next
+# to each other in the control table, so one contiguous block covers all three registers.
+class SnapshotReader:
+    def __init__(self, packetHandler, portHandler, motor_ids, load_addr, vel_addr, pos_addr):
+        self.motor_ids = list(motor_ids)
+        self.start_addr = min(load_addr, vel_addr, pos_addr)
+        self.block_length = max(load_addr + 2, vel_addr + 4, pos_addr + 4) - self.start_addr
+        # Little-endian signed layout of one motor's block, so decoding is a single frombuffer
+        self.dtype = np.dtype({'names': ['load', 'vel', 'pos'],
+                               'formats': ['<i2', '<i4', '<i4'],
+                               'offsets': [load_addr - self.start_addr, vel_addr - self.start_addr, pos_addr - self.start_addr],
+                               'itemsize': self.block_length})
+        from dynamixel_sdk import GroupSyncRead, COMM_SUCCESS
+        self.comm_success = COMM_SUCCESS
+        self.groupSyncRead = GroupSyncRead(portHandler, packetHandler, self.start_addr, self.block_length)
+        for m_id in self.motor_ids:
+            self.groupSyncRead.addParam(m_id)
+
+    # Returns (pos, vel, load) as signed arrays ordered like motor_ids, or None if the read failed
+    def read(self):
+        if self.groupSyncRead.txRxPacket() != self.comm_success:
+            return None
+        raw = bytearray()
+        for m_id in self.motor_ids:
+            data = self.groupSyncRead.data_dict[m_id]
+            if len(data) != self.block_length:
+                return None
+            raw += bytes(data)
+        block = np.frombuffer(raw, dtype=self.dtype)
+        return block['pos'], block['vel'], block['load']
+
+# Command every motor with one GroupSyncWrite packet, so all joints start moving together.
+# PROFILE_VELOCITY (4 bytes) is directly followed by GOAL_POSITION (4 bytes), so one 8-byte
+# block sets both; goal-only writes use a 4-byte block and torque a 1-byte block.
+class JointCommander:
+    def __init__(self, packetHandler, portHandler, motor_ids, profile_vel_addr, goal_pos_addr, torque_addr=None):
+        if goal_pos_addr != profile_vel_addr + 4:
+            raise ValueError("GOAL_POSITION must directly follow PROFILE_VELOCITY in the control table")
+        from dynamixel_sdk import GroupSyncWrite
+        self.motor_ids = list(motor_ids)
+        self.block = np.zeros(len(self.motor_ids), dtype=[('profile', '<u4'), ('goal', '<i4')])
+        self.profileGoalWrite = GroupSyncWrite(portHandler, packetHandler, profile_vel_addr, 8)
+        self.goalWrite = GroupSyncWrite(portHandler, packetHandler, goal_pos_addr, 4)
+        self.torqueWrite = GroupSyncWrite(portHandler, packetHandler, torque_addr, 1) if torque_addr is not None else None
+        for groupSyncWrite in (self.profileGoalWrite, self.goalWrite, self.torqueWrite):
+            if groupSyncWrite is not None:
+                for m_id in self.motor_ids:
+                    groupSyncWrite.addParam(m_id, [0] * groupSyncWrite.data_length)
+
+    # Goal positions (and optionally profile velocities) ordered like motor_ids; scalars apply to every motor
+    def write(self, goal_positions, profile_velocities=None):
+        self.block['goal'] = goal_positions
+        if profile_velocities is None:
+            return self._send(self.goalWrite, self.block['goal'])
+        self.block['profile'] = profile_velocities
+        return self._send(self.profileGoalWrite, self.block)
+
+    def torque(self, enable):
+        return self._send(self.torqueWrite, np.full(len(self.motor_ids), int(enable), dtype=np.uint8))
+
+    def _send(self, groupSyncWrite, values):
+        raw = values.tobytes()
+        size = groupSyncWrite.data_length
+        for i, m_id in enumerate(self.motor_ids):
+            groupSyncWrite.changeParam(m_id, list(raw[i * size:(i + 1) * size]))
+        return groupSyncWrite.txPacket()
+
+# Watches one motor in the snapshot stream and reports when a commanded move has finished: it
+# arrived (within pos_tolerance of the goal and slower than vel_tolerance) or it stalled (slower
+# than vel_tolerance for stall_time without arriving, e.g. blocked by a grasped object).
+# update() is fed every snapshot by the reading thread; wait() blocks the commanding thread.
+class MotionMonitor:
+    def __init__(self, motor_idx, pos_tolerance, vel_tolerance, stall_time):
+        self.motor_idx = motor_idx
+        self.pos_tolerance = pos_tolerance
+        self.vel_tolerance = vel_tolerance
+        self.stall_time = stall_time
+        self.condition = threading.Condition()
+        self.goal = None
+        self.result = None
+        self.still_since = None
+        self.counts = {'arrived': 0, 'stalled': 0, 'timeout': 0}
+
+    def start_move(self, goal):
+        with self.condition:
+            self.goal = goal
+            self.result = None
+            self.still_since = None
+
+    def update(self, t, pos, vel):
+        with self.condition:
+            if self.goal is None or self.result is not None:
+                return
+            if abs(int(vel[self.motor_idx])) > self.vel_tolerance:
+                self.still_since = None
+                return
+            if abs(int(pos[self.motor_idx]) - self.goal) <= self.pos_tolerance:
+                self.result = 'arrived'
+            elif self.still_since is None:
+                self.still_since = t
+            elif t - self.still_since >= self.stall_time:
+                self.result = 'stalled'
+            if self.result is not None:
+                self.condition.notify_all()
+
+    # Returns 'arrived', 'stalled' or 'timeout'
+    def wait(self, timeout):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.result is not None, timeout):
+                self.result = 'timeout'
+            self.counts[self.result] += 1
+            return self.result
+
+# Setpoints through a list of keyframe poses, one row per control tick. Segments use smoothstep
+# easing so the arm is at rest at every keyframe; a segment gets enough ticks that no joint moves
+# more than max_step per tick at its fastest (1.5x the segment's average speed).
+def interpolate_trajectory(keyframes, max_step):
+    keyframes = np.asarray(keyframes, dtype=float)
+    segments = [keyframes[:1]]
+    for start, end in zip(keyframes[:-1], keyframes[1:]):
+        ticks = max(int(np.ceil(1.5 * np.abs(end - start).max() / max_step)), 1)
+        s = np.arange(1, ticks + 1) / ticks
+        s = s * s * (3 - 2 * s)
+        segments.append(start + s[:, None] * (end - start))
+    return np.rint(np.concatenate(segments)).astype(np.int32)
+
 # Normalize function
 def normalize(value, min_val, max_val):
     if value < min_val:
@@ -53,21 +179,55 @@ def bin(value, num_bins):
         bin_index = num_bins - 1
     return bin_index
 
-# Convert position and velocity into feature vector X
-def featurize(pos, vel, motorMovement, learningParams):
+# Convert position and velocity into the index of the single active feature
+def feature_index(pos, vel, motorMovement, learningParams):
     # Normalize position and velocity to [0, 1]
     pos_norm = normalize(pos, motorMovement.HAND_POS_1, motorMovement.HAND_POS_2)
     vel_norm = normalize(vel, -motorMovement.MOTOR_VELO, motorMovement.MOTOR_VELO)
     # Determine bin indices
     pos_bin = bin(pos_norm, learningParams.NUM_POS_BINS)
     vel_bin = bin(vel_norm, learningParams.NUM_VEL_BINS)
+    return pos_bin * learningParams.NUM_VEL_BINS + vel_bin
+
+# Convert position and velocity into feature vector X
+def featurize(pos, vel, motorMovement, learningParams):
     # Create feature vector
     x = np.zeros(learningParams.NUM_POS_BINS * learningParams.NUM_VEL_BINS, dtype=int)
-    feature_idx = pos_bin * learningParams.NUM_VEL_BINS + vel_bin
-    x[feature_idx] = 1
+    x[feature_index(pos, vel, motorMovement, learningParams)] = 1
     return x
 
 def cumulant_loadThreshold(load, load_threshold):
     # Convert load into signal of interest (cumulant)
     c = 1 if abs(load) > load_threshold else 0
     return c
+
+# --- Batch Versions ----------------------------------------------------------------------
+# Array-at-a-time equivalents of the functions above, for recorded logs. Each gives exactly the
+# scalar function's result for every element (same clamping, same float operations).
+def normalize_batch(values, min_val, max_val):
+    return (np.clip(values, min_val, max_val) - min_val) / (max_val - min_val)
+
+def bin_batch(values, num_bins):
+    return np.clip(np.ceil(values * num_bins) - 1, 0, num_bins - 1).astype(np.intp)
+
+def feature_indices(pos, vel, motorMovement, learningParams):
+    pos_bin = bin_batch(normalize_batch(pos, motorMovement.HAND_POS_1, motorMovement.HAND_POS_2), learningParams.NUM_POS_BINS)
+    vel_bin = bin_batch(normalize_batch(vel, -motorMovement.MOTOR_VELO, motorMovement.MOTOR_VELO), learningParams.NUM_VEL_BINS)
+    return pos_bin * learningParams.NUM_VEL_BINS + vel_bin
+
+def cumulant_loadThreshold_batch(load, load_threshold):
+    # Widen first: abs() of the most negative int16 would overflow
+    return (np.abs(np.asarray(load, dtype=np.int64)) > load_threshold).astype(float)
+
+# Cumulant factories for the Horde. Each returns a function of the snapshot arrays (pos, vel, load),
+# indexed by the motor's position in MOTOR_IDS.
+def make_load_threshold_cumulant(motor_idx, load_threshold):
+    return lambda pos, vel, load: cumulant_loadThreshold(load[motor_idx], load_threshold)
+
+def make_load_cumulant(motor_idx, max_load):
+    # Absolute load scaled to [0, 1]
+    return lambda pos, vel, load: min(abs(int(load[motor_idx])), max_load) / max_load
+
+def make_position_cumulant(motor_idx, target, tolerance):
+    # 1 while the motor is within tolerance of the target position
+    return lambda pos, vel, load: 1 if abs(int(pos[motor_idx]) - target) <= tolerance else 0
@@ -0,0 +1,109 @@
+import numpy as np
+
+# --- Binary Sensor Log -------------------------------------------------------------------
+# A log file is a 64-byte header followed by fixed-width records, one per motor per snapshot.
+# The recorder grows the file in preallocated chunks and writes straight into a memory map;
+# open_log maps the records back as a NumPy structured array without parsing anything.
+
+LOG_MAGIC = b'DXLLOG01'
+MAX_MOTORS = 32
+HEADER_DTYPE = np.dtype({'names': ['magic', 'record_size', 'num_motors', 'count', 'motor_ids'],
+                         'formats': ['S8', '<u4', '<u4', '<u8', ('u1', (MAX_MOTORS,))],
+                         'offsets': [0, 8, 12, 16, 24],
+                         'itemsize': 64})
+HEADER_SIZE = HEADER_DTYPE.itemsize
+LOG_DTYPE = np.dtype([('t', '<f8'),          # Monotonic time since the recorder was opened (s)
+                      ('motor_id', 'u1'),
+                      ('paused', 'u1'),
+                      ('load', '<i2'),
+                      ('vel', '<i4'),
+                      ('pos', '<i4'),
+                      ('goal', '<i4')])
+
+class SensorRecorder:
+    def __init__(self, path, motor_ids, chunk_records=65536):
+        self.motor_ids = np.asarray(motor_ids, dtype=np.uint8)
+        self.chunk_records = chunk_records
+        self.file = open(path, 'w+b')
+        self.header = np.zeros(1, dtype=HEADER_DTYPE)
+        self.header['magic'] = LOG_MAGIC
+        self.header['record_size'] = LOG_DTYPE.itemsize
+        self.header['num_motors'] = len(self.motor_ids)
+        self.header['motor_ids'][0, :len(self.motor_ids)] = self.motor_ids
+        self.count = 0
+        self.capacity = 0
+        self.records = None
+        self._write_header()
+        self._grow()
+
+    # Append one snapshot: one record per motor, written as column slices of the memory map
+    def record(self, t, pos, vel, load, goal, paused):
+        n = len(self.motor_ids)
+        if self.count + n > self.capacity:
+            self._grow()
+        rows = slice(self.count, self.count + n)
+        self.t[rows] = t
+        self.motor_id[rows] = self.motor_ids
+        self.paused[rows] = paused
+        self.load[rows] = load
+        self.vel[rows] = vel
+        self.pos[rows] = pos
+        self.goal[rows] = goal
+        self.count += n
+
+    # Make everything recorded so far readable by open_log
+    def flush(self):
+        self.records.flush()
+        self._write_header()
+
+    def close(self):
+        self._unmap()
+        self.file.truncate(HEADER_SIZE + self.count * LOG_DTYPE.itemsize)
+        self.file.close()
+
+    def _write_header(self):
+        self.header['count'] = self.count
+        self.file.seek(0)
+        self.file.write(self.header.tobytes())
+        self.file.flush()
+
+    # Flush and drop the map and every view of it. Windows can't resize a file while a view of it
+    # is mapped, so this comes before any truncate.
+    def _unmap(self):
+        if self.records is None:
+            return
+        self.flush()
+        self.t = self.motor_id = self.paused = self.load = self.vel = self.pos = self.goal = None
+        self.records = None  # Last reference: the mapping is closed here
+
+    # Extend the file by one chunk and remap it
+    def _grow(self):
+        self._unmap()
+        self.capacity += self.chunk_records
+        self.file.truncate(HEADER_SIZE + self.capacity * LOG_DTYPE.itemsize)
+        self.records = np.memmap(self.file, dtype=LOG_DTYPE, mode='r+', offset=HEADER_SIZE, shape=(self.capacity,))
+        self.t, self.motor_id, self.paused = self.records['t'], self.records['motor_id'], self.records['paused']
+        self.load, self.vel, self.pos, self.goal = self.records['load'], self.records['vel'], self.records['pos'], self.records['goal']
+
+# Map a log as a read-only structured array of LOG_DTYPE records
+def open_log(path):
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header['magic'][0] != LOG_MAGIC or header['record_size'][0] != LOG_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a sensor log")
+    count = int(header['count'][0])
+    if count == 0:
+        return np.zeros(0, dtype=LOG_DTYPE)
+    return np.memmap(path, dtype=LOG_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+# Motor IDs stored in a log's header, in snapshot order
+def log_motor_ids(path):
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+    return [int(m_id) for m_id in header['motor_ids'][:header['num_motors']]]
+
+# Records of one motor (copied out of the map)
+def motor_records(log, motor_id):
+    return log[log['motor_id'] == motor_id]
+
+# Records as a (snapshots, motors) array, motors in log_motor_ids order
+def snapshot_records(log, num_motors):
+    return log[:len(log) // num_motors * num_motors].reshape(-1, num_motors)
@@ -0,0 +1,332 @@
+import time
+import threading
+import numpy as np
+from dataclasses import dataclass
+from loopScheduler import wait_until
+from dynamixel_sdk import COMM_SUCCESS, COMM_RX_TIMEOUT, COMM_NOT_AVAILABLE, BROADCAST_ID
+
+# In-memory stand-in for an XL330 chain on a U2D2 adapter. SimulatedPortHandler owns the motors and
+# the bus clock, SimulatedPacketHandler implements the same read*/write*TxRx, sync and bulk calls as
+# dynamixel_sdk's Protocol 2.0 handler, so GroupSyncRead/GroupSyncWrite work on top of it unchanged.
+
+# --- XL330 Control Table -----------------------------------------------------------------
+ADDR_MODEL_NUMBER = 0
+ADDR_BAUD_RATE = 8
+ADDR_RETURN_DELAY_TIME = 9
+ADDR_TORQUE_ENABLE = 64
+ADDR_PROFILE_VELOCITY = 112
+ADDR_GOAL_POSITION = 116
+ADDR_MOVING = 122
+ADDR_MOVING_STATUS = 123
+ADDR_PRESENT_LOAD = 126
+ADDR_PRESENT_VELOCITY = 128
+ADDR_PRESENT_POSITION = 132
+CONTROL_TABLE_SIZE = 256
+
+XL330_MODEL_NUMBER = 1200
+BAUD_RATES = {0: 9600, 1: 57600, 2: 115200, 3: 1000000, 4: 2000000, 5: 3000000, 6: 4000000}
+VELOCITY_UNIT = 0.229   # rev/min per velocity unit
+POSITION_PER_REV = 4096
+VELOCITY_LIMIT = 445    # Used when PROFILE_VELOCITY is 0 (no profile)
+
+# Protocol 2.0 packet sizes (header, id, length, instruction/error, crc)
+READ_PACKET = 14
+WRITE_PACKET = 12
+STATUS_PACKET = 11
+SYNC_PACKET = 14
+BULK_PACKET = 10
+
+# Latency model for one bus transaction:
+@dataclass
+class LatencyModel:
+    USB_LATENCY: float = 0.001        # Fixed host/USB cost per transaction (seconds)
+    BITS_PER_BYTE: int = 10           # 8N1 framing
+    RETURN_DELAY_UNIT: float = 2e-6   # Seconds per Return Delay Time count
+
+    def transaction_time(self, baudrate, tx_bytes, rx_bytes, return_delays):
+        wire_time = (tx_bytes + rx_bytes) * self.BITS_PER_BYTE / baudrate
+        return self.USB_LATENCY + wire_time + sum(return_delays) * self.RETURN_DELAY_UNIT
+
+# Gripper/joint kinematics:
+@dataclass
+class MotorModel:
+    FRICTION_LOAD: int = 20      # Load while moving freely (0.1 % units)
+    CONTACT_STIFFNESS: float = 2.0   # Load per position count pushed past an obstacle
+    MAX_LOAD: int = 1000
+    LOAD_NOISE: float = 3.0
+
+class SimulatedMotor:
+    def __init__(self, dxl_id, position, motorModel, rng):
+        self.id = dxl_id
+        self.model = motorModel
+        self.rng = rng
+        self.table = bytearray(CONTROL_TABLE_SIZE)
+        self.position = float(position)
+        self.obstacle = None  # Position the motor cannot be driven below (object in the gripper)
+        self.write(ADDR_MODEL_NUMBER, 2, XL330_MODEL_NUMBER)
+        self.write(ADDR_BAUD_RATE, 1, 3)
+        self.write(ADDR_RETURN_DELAY_TIME, 1, 250)
+        self.write(ADDR_GOAL_POSITION, 4, int(position))
+        self.write(ADDR_PRESENT_POSITION, 4, int(position))
+
+    def read(self, address, length):
+        return int.from_bytes(self.table[address:address + length], 'little')
+
+    def write(self, address, length, value):
+        self.table[address:address + length] = (value & ((1 << (8 * length)) - 1)).to_bytes(length, 'little')
+
+    def read_signed(self, address, length):
+        return int.from_bytes(self.table[address:address + length], 'little', signed=True)
+
+    # Advance the motor by dt seconds and refresh the Present/Moving registers
+    def step(self, dt):
+        goal = self.read_signed(ADDR_GOAL_POSITION, 4)
+        profile = self.read(ADDR_PROFILE_VELOCITY, 4) or VELOCITY_LIMIT
+        velocity = 0
+        load = 0
+        if self.read(ADDR_TORQUE_ENABLE, 1):
+            speed = profile * VELOCITY_UNIT * POSITION_PER_REV / 60  # counts per second
+            error = goal - self.position
+            direction = 1 if error > 0 else -1
+            if error != 0:
+                self.position += direction * min(abs(error), speed * dt)
+                velocity = direction * profile
+                load = direction * self.model.FRICTION_LOAD
+            if self.obstacle is not None and self.position <= self.obstacle and goal < self.obstacle:
+                # Squeezing an object: the motor stalls and load builds with how far it is pushed
+                self.position = self.obstacle
+                velocity = 0
+                load = -min(self.model.MAX_LOAD, self.model.CONTACT_STIFFNESS * (self.obstacle - goal))
+        self.position = min(max(self.position, 0), POSITION_PER_REV - 1)
+        if load != 0:
+            load += self.rng.normal(0, self.model.LOAD_NOISE)
+        moving = velocity != 0
+        self.write(ADDR_PRESENT_POSITION, 4, int(round(self.position)))
+        self.write(ADDR_PRESENT_VELOCITY, 4, velocity)
+        self.write(ADDR_PRESENT_LOAD, 2, int(round(load)))
+        self.write(ADDR_MOVING, 1, int(moving))
+        self.write(ADDR_MOVING_STATUS, 1, 0x01 if not moving and self.read(ADDR_TORQUE_ENABLE, 1) else 0x00)
+
+class SimulatedPortHandler:
+    def __init__(self, port_name, motor_ids, initial_positions=None, obstacles=None,
+                 latencyModel=None, motorModel=None, seed=0):
+        self.port_name = port_name
+        self.baudrate = 1000000
+        self.is_open = False
+        self.is_using = False
+        self.latency = latencyModel if latencyModel is not None else LatencyModel()
+        rng = np.random.default_rng(seed)
+        motorModel = motorModel if motorModel is not None else MotorModel()
+        initial_positions = initial_positions or {}
+        self.motors = {m_id: SimulatedMotor(m_id, initial_positions.get(m_id, 2048), motorModel, rng) for m_id in motor_ids}
+        for m_id, position in (obstacles or {}).items():
+            self.motors[m_id].obstacle = position
+        self.lock = threading.Lock()  # The bus is half duplex: one transaction at a time
+        self.last_update = time.perf_counter()
+        self.sync_replies = {}
+        self.sync_order = []
+        self.transaction_count = 0
+        self.bus_time = 0.0
+
+    def openPort(self):
+        self.is_open = True
+        return True
+
+    def closePort(self):
+        self.is_open = False
+
+    def clearPort(self):
+        self.sync_replies.clear()
+
+    def setPortName(self, port_name):
+        self.port_name = port_name
+
+    def getPortName(self):
+        return self.port_name
+
+    def setBaudRate(self, baudrate):
+        if baudrate not in BAUD_RATES.values():
+            return False
+        self.baudrate = baudrate
+        return True
+
+    def getBaudRate(self):
+        return self.baudrate
+
+    def setPacketTimeout(self, packet_length):
+        pass
+
+    def setPacketTimeoutMillis(self, msec):
+        pass
+
+    def isPacketTimeout(self):
+        return False
+
+    def getCurrentTime(self):
+        return time.perf_counter() * 1000.0
+
+    # Motors that would hear the host at the current baud rate
+    def listening(self, dxl_id):
+        motor = self.motors.get(dxl_id)
+        if motor is None or BAUD_RATES.get(motor.read(ADDR_BAUD_RATE, 1)) != self.baudrate:
+            return None
+        return motor
+
+    # Run the kinematics up to now, then hold the bus for the modelled transaction time
+    def transact(self, tx_bytes, rx_bytes=0, replying=()):
+        now = time.perf_counter()
+        dt = now - self.last_update
+        self.last_update = now
+        for motor in self.motors.values():
+            motor.step(dt)
+        duration = self.latency.transaction_time(self.baudrate, tx_bytes, rx_bytes,
+                                                 [m.read(ADDR_RETURN_DELAY_TIME, 1) for m in replying])
+        self.transaction_count += 1
+        self.bus_time += duration
+        wait_until(now + duration)
+
+class SimulatedPacketHandler:
+    def __init__(self, protocol_version=2.0):
+        self.protocol_version = protocol_version
+
+    def getProtocolVersion(self):
+        return self.protocol_version
+
+    def getTxRxResult(self, result):
+        if result == COMM_SUCCESS:
+            return "[TxRxResult] Communication success!"
+        if result == COMM_RX_TIMEOUT:
+            return "[TxRxResult] There is no status packet!"
+        if result == COMM_NOT_AVAILABLE:
+            return "[TxRxResult] Port is not available!"
+        return "[TxRxResult] Incorrect instruction packet!"
+
+    def getRxPacketError(self, error):
+        return "" if error == 0 else "[RxPacketError] Simulated hardware error!"
+
+    # --- Single motor instructions ---
+    def ping(self, port, dxl_id):
+        with port.lock:
+            motor = port.listening(dxl_id)
+            port.transact(10, STATUS_PACKET + 3, [motor] if motor else ())
+            if motor is None:
+                return 0, COMM_RX_TIMEOUT, 0
+            return motor.read(ADDR_MODEL_NUMBER, 2), COMM_SUCCESS, 0
+
+    def readTxRx(self, port, dxl_id, address, length):
+        with port.lock:
+            motor = port.listening(dxl_id)
+            port.transact(READ_PACKET, STATUS_PACKET + length, [motor] if motor else ())
+            if motor is None:
+                return [], COMM_RX_TIMEOUT, 0
+            return list(motor.table[address:address + length]), COMM_SUCCESS, 0
+
+    def read1ByteTxRx(self, port, dxl_id, address):
+        data, result, error = self.readTxRx(port, dxl_id, address, 1)
+        return (data[0] if result == COMM_SUCCESS else 0), result, error
+
+    def read2ByteTxRx(self, port, dxl_id, address):
+        data, result, error = self.readTxRx(port, dxl_id, address, 2)
+        return (int.from_bytes(bytes(data), 'little') if result == COMM_SUCCESS else 0), result, error
+
+    def read4ByteTxRx(self, port, dxl_id, address):
+        data, result, error = self.readTxRx(port, dxl_id, address, 4)
+        return (int.from_bytes(bytes(data), 'little') if result == COMM_SUCCESS else 0), result, error
+
+    def writeTxOnly(self, port, dxl_id, address, length, data):
+        with port.lock:
+            port.transact(WRITE_PACKET + length)
+            self._store(port, dxl_id, address, length, data)
+            return COMM_SUCCESS
+
+    def writeTxRx(self, port, dxl_id, address, length, data):
+        with port.lock:
+            motor = port.listening(dxl_id)
+            port.transact(WRITE_PACKET + length, STATUS_PACKET, [motor] if motor else ())
+            if motor is None:
+                return COMM_RX_TIMEOUT, 0
+            self._store(port, dxl_id, address, length, data)
+            return COMM_SUCCESS, 0
+
+    def write1ByteTxOnly(self, port, dxl_id, address, data):
+        return self.writeTxOnly(port, dxl_id, address, 1, _to_bytes(data, 1))
+
+    def write1ByteTxRx(self, port, dxl_id, address, data):
+        return self.writeTxRx(port, dxl_id, address, 1, _to_bytes(data, 1))
+
+    def write2ByteTxOnly(self, port, dxl_id, address, data):
+        return self.writeTxOnly(port, dxl_id, address, 2, _to_bytes(data, 2))
+
+    def write2ByteTxRx(self, port, dxl_id, address, data):
+        return self.writeTxRx(port, dxl_id, address, 2, _to_bytes(data, 2))
+
+    def write4ByteTxOnly(self, port, dxl_id, address, data):
+        return self.writeTxOnly(port, dxl_id, address, 4, _to_bytes(data, 4))
+
+    def write4ByteTxRx(self, port, dxl_id, address, data):
+        return self.writeTxRx(port, dxl_id, address, 4, _to_bytes(data, 4))
+
+    # --- Group instructions (used by GroupSyncRead/Write and GroupBulkRead/Write) ---
+    def syncReadTx(self, port, start_address, data_length, param, param_length, fast_option):
+        with port.lock:
+            motors = [port.listening(dxl_id) for dxl_id in param[:param_length]]
+            replying = [m for m in motors if m is not None]
+            port.transact(SYNC_PACKET + param_length, len(replying) * (STATUS_PACKET + data_length), replying)
+            port.sync_replies = {m.id: list(m.table[start_address:start_address + data_length]) for m in replying}
+            port.sync_order = [m.id for m in replying]
+            return COMM_SUCCESS
+
+    def readRx(self, port, dxl_id, length):
+        data = port.sync_replies.pop(dxl_id, None)
+        if data is None:
+            return [], COMM_RX_TIMEOUT, 0
+        return data[:length], COMM_SUCCESS, 0
+
+    def fastSyncReadRx(self, port, dxl_id, length):
+        # Fast sync read replies are concatenated [error, id, data..., crc_l, crc_h] per device
+        raw = []
+        for m_id in port.sync_order:
+            raw.extend([0, m_id] + port.sync_replies.pop(m_id, []) + [0, 0])
+        if len(raw) != length:
+            return [], COMM_RX_TIMEOUT, 0
+        return raw, COMM_SUCCESS, 0
+
+    def syncWriteTxOnly(self, port, start_address, data_length, param, param_length):
+        with port.lock:
+            port.transact(SYNC_PACKET + param_length)
+            for i in range(0, param_length, data_length + 1):
+                self._store(port, param[i], start_address, data_length, param[i + 1:i + 1 + data_length])
+            return COMM_SUCCESS
+
+    def bulkReadTx(self, port, param, param_length, fast_option):
+        with port.lock:
+            requests = [(param[i], param[i + 1] | (param[i + 2] << 8), param[i + 3] | (param[i + 4] << 8))
+                        for i in range(0, param_length, 5)]
+            replying = [(port.listening(dxl_id), address, length) for dxl_id, address, length in requests]
+            replying = [r for r in replying if r[0] is not None]
+            port.transact(BULK_PACKET + param_length, sum(STATUS_PACKET + length for _, _, length in replying),
+                          [m for m, _, _ in replying])
+            port.sync_replies = {m.id: list(m.table[address:address + length]) for m, address, length in replying}
+            port.sync_order = [m.id for m, _, _ in replying]
+            return COMM_SUCCESS
+
+    def bulkWriteTxOnly(self, port, param, param_length):
+        with port.lock:
+            port.transact(BULK_PACKET + param_length)
+            i = 0
+            while i < param_length:
+                dxl_id, address, length = param[i], param[i + 1] | (param[i + 2] << 8), param[i + 3] | (param[i + 4] << 8)
+                self._store(port, dxl_id, address, length, param[i + 5:i + 5 + length])
+                i += 5 + length
+            return COMM_SUCCESS
+
+    def _store(self, port, dxl_id, address, length, data):
+        targets = port.motors if dxl_id == BROADCAST_ID else [dxl_id]
+        for motor in map(port.listening, targets):
+            # EEPROM area (below TORQUE_ENABLE) is write-protected while torque is on
+            if motor is None or (address < ADDR_TORQUE_ENABLE and motor.read(ADDR_TORQUE_ENABLE, 1)):
+                continue
+            motor.table[address:address + length] = bytes(data[:length])
+
+def _to_bytes(value, length):
+    return list((int(value) & ((1 << (8 * length)) - 1)).to_bytes(length, 'little'))
@@ -0,0 +1,108 @@
+import sys
+import json
+import math
+import time
+
+# --- Hot-Path Instrumentation ------------------------------------------------------------
+# Fixed-memory latency histograms per named stage. Recording a sample is a log10 and a list
+# increment, so the loop can time every stage on every step.
+
+class LatencyHistogram:
+    # Log-spaced bins from `low` to `high` seconds, plus an underflow and an overflow bin
+    def __init__(self, low=1e-6, high=10.0, bins_per_decade=20):
+        self.low = low
+        self.bins_per_decade = bins_per_decade
+        self.num_bins = int(math.ceil(math.log10(high / low) * bins_per_decade)) + 2
+        self.counts = [0] * self.num_bins
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds > self.low:
+            i = min(int(math.log10(seconds / self.low) * self.bins_per_decade) + 1, self.num_bins - 1)
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    # Upper edge of the bin holding the q-th percentile
+    def percentile(self, q):
+        if self.count == 0:
+            return float('nan')
+        target = q / 100 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return min(self.low * 10 ** (i / self.bins_per_decade), self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.total / self.count if self.count else float('nan'),
+                'p50': self.percentile(50), 'p95': self.percentile(95), 'p99': self.percentile(99), 'max': self.max}
+
+class StageTimers:
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    # Record the time since `since` under `stage` and return now, to chain consecutive stages
+    def lap(self, stage, since):
+        now = time.perf_counter()
+        self.record(stage, now - since)
+        return now
+
+    # The loop and bus threads may add stages while another thread reports; list() copies the
+    # items in one step, so the iteration never sees the dict change size
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in list(self.histograms.items())}
+
+    def report(self):
+        lines = [f"{'stage':<24}{'count':>9}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'max us':>10}"]
+        for stage, s in self.summary().items():
+            lines.append(f"{stage:<24}{s['count']:>9}{s['p50'] * 1e6:>10.0f}{s['p95'] * 1e6:>10.0f}"
+                         f"{s['p99'] * 1e6:>10.0f}{s['max'] * 1e6:>10.0f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump({stage: dict(h.summary(), counts=h.counts) for stage, h in list(self.histograms.items())}, f, indent=1)
+
+# Wraps a packet handler so every bus transaction is timed under its method name
+class TimedPacketHandler:
+    TIMED_SUFFIXES = ('TxRx', 'TxOnly', 'Tx', 'Rx')
+
+    def __init__(self, packetHandler, timers):
+        self.packetHandler = packetHandler
+        self.timers = timers
+
+    def __getattr__(self, name):
+        attr = getattr(self.packetHandler, name)
+        if not (callable(attr) and name.endswith(self.TIMED_SUFFIXES)):
+            return attr
+        timers = self.timers
+        def timed(*args):
+            start = time.perf_counter()
+            result = attr(*args)
+            timers.record('bus.' + name, time.perf_counter() - start)
+            return result
+        setattr(self, name, timed)  # Cache, so later calls skip __getattr__
+        return timed
+
+# Compare p50/p99 of the stages in two timing dumps: python stageTimers.py before.json after.json
+if __name__ == '__main__':
+    before, after = (json.load(open(path)) for path in sys.argv[1:3])
+    print(f"{'stage':<24}{'p50 before':>12}{'p50 after':>12}{'p99 before':>12}{'p99 after':>12}  (us)")
+    for stage in sorted(set(before) | set(after)):
+        b, a = before.get(stage, {}), after.get(stage, {})
+        row = [b.get('p50'), a.get('p50'), b.get('p99'), a.get('p99')]
+        print(f"{stage:<24}" + "".join(f"{(v if v is not None else float('nan')) * 1e6:>12.0f}" for v in row))
@@ -0,0 +1,315 @@
+import numpy as np
+
+# --- Sparse TD Learners ------------------------------------------------------------------
+# Features are binary and passed as an array of active indices (one-hot: one index, k-hot: k
+# indices) instead of a dense 0/1 vector, so predictions and updates only touch active weights.
+
+# TD(0) for a single prediction. For one-hot features this gives exactly the same numbers as the
+# dense `delta = c + GAMMA*w@x - w@x_prev; w = w + ALPHA*delta*x_prev` update.
+class SparseTD:
+    def __init__(self, num_features, gamma, alpha, num_active=1):
+        self.gamma = gamma
+        self.alpha = alpha
+        self.w = np.zeros(num_features)
+        self.x_prev = np.zeros(num_active, dtype=np.intp)  # Active indices of the previous state
+        self.has_prev = False  # The first step has no previous state (dense x_prev of zeros)
+        self.gathered = np.zeros(num_active)  # Scratch buffer so reads don't allocate
+
+    # Sum of the active weights (w@x for a binary x)
+    def predict(self, active):
+        return np.take(self.w, active, out=self.gathered).sum()
+
+    # One TD(0) step for the transition x_prev -> active with cumulant c. Returns delta.
+    def update(self, active, c):
+        v = self.predict(active)
+        v_prev = self.predict(self.x_prev) if self.has_prev else 0.0
+        delta = c + self.gamma * v - v_prev
+        if self.has_prev:
+            # add.at is unbuffered, so repeated indices (k-hot hash collisions) accumulate correctly
+            np.add.at(self.w, self.x_prev, self.alpha * delta)
+        self.x_prev[:] = active
+        self.has_prev = True
+        return delta
+
+    # Forget the previous state, so the next update doesn't bootstrap across a break in the data
+    def reset_episode(self):
+        self.has_prev = False
+
+# Horde of GVFs learned with TD(0) in one matrix update. Every cumulant is paired with every
+# gamma: GVF k uses cumulant k // len(gammas) and gamma gammas[k % len(gammas)].
+class Horde:
+    def __init__(self, num_features, gammas, cumulants, alpha, num_active=1):
+        self.cumulants = list(cumulants)  # Functions of the (pos, vel, load) snapshot arrays
+        self.num_gammas = len(gammas)
+        self.gammas = np.tile(np.asarray(gammas, dtype=float), len(self.cumulants))
+        self.num_gvfs = len(self.gammas)
+        self.alpha = alpha  # Scalar or one step size per GVF
+        # Column-major, so the weights of one feature for all GVFs (W[:, i]) are contiguous
+        self.W = np.zeros((self.num_gvfs, num_features), order='F')
+        self.WT = self.W.T  # C-contiguous view indexed by feature; np.take along W's axis 1 would copy all of W
+        self.x_prev = np.zeros(num_active, dtype=np.intp)
+        self.has_prev = False
+        self.steps = 0  # Updates made, including those of earlier sessions restored by load_state
+        # Scratch buffers so a step doesn't allocate
+        self.gathered = np.zeros((num_active, self.num_gvfs))
+        self.v = np.zeros(self.num_gvfs)
+        self.v_prev = np.zeros(self.num_gvfs)
+        self.delta = np.zeros(self.num_gvfs)
+        self.c = np.zeros(self.num_gvfs)
+
+    # Evaluate each distinct cumulant once and share it across all of its gammas
+    def cumulant(self, pos, vel, load):
+        signals = self.c.reshape(len(self.cumulants), self.num_gammas)
+        for i, cumulant in enumerate(self.cumulants):
+            signals[i] = cumulant(pos, vel, load)
+        return self.c
+
+    # Value of every GVF for the active features (W@x for a binary x)
+    def predict(self, active, out=None):
+        np.take(self.WT, active, axis=0, out=self.gathered)
+        return self.gathered.sum(axis=0, out=self.v if out is None else out)
+
+    # One TD(0) step of every GVF for the transition x_prev -> active. Returns the TD errors.
+    def update(self, active, c):
+        self.predict(active, out=self.v)
+        if self.has_prev:
+            self.predict(self.x_prev, out=self.v_prev)
+        else:
+            self.v_prev[:] = 0
+        np.multiply(self.gammas, self.v, out=self.delta)
+        self.delta += c
+        self.delta -= self.v_prev
+        if self.has_prev:
+            np.add.at(self.WT, self.x_prev, self.alpha * self.delta)
+        self.x_prev[:] = active
+        self.has_prev = True
+        self.steps += 1
+        return self.delta
+
+    # Start a new episode: the next step has no previous state to learn from (e.g. after a warm start)
+    def reset_episode(self):
+        self.has_prev = False
+
+    # Copies of everything needed to resume learning, safe to hand to another thread. With
+    # copy=False the arrays are the learner's own (for copying them a piece at a time).
+    def state(self, copy=True):
+        state = {'W': self.W, 'x_prev': self.x_prev, 'has_prev': np.array(self.has_prev), 'steps': np.array(self.steps)}
+        return _copied(state) if copy else state
+
+    # Restore a state() (possibly memory-mapped); entries this learner doesn't use are ignored
+    def load_state(self, state):
+        if state['W'].shape != self.W.shape or state['x_prev'].shape != self.x_prev.shape:
+            raise ValueError(f"Saved weights {state['W'].shape} don't fit this learner's {self.W.shape}")
+        self.W[...] = state['W']
+        self.x_prev[:] = state['x_prev']
+        self.has_prev = bool(state['has_prev'])
+        self.steps = int(state['steps'])
+
+# Eligibility traces of a Horde, stored only for recently active features. Row i of `values`
+# holds the trace of feature indices[i] for every GVF; slot maps a feature to its row (-1 if
+# untraced). Rows whose traces have decayed below threshold for every GVF are pruned, so the
+# work per step follows the number of recently active features, not num_features.
+class SparseTraces:
+    def __init__(self, num_features, num_gvfs, threshold=1e-4, capacity=256):
+        self.threshold = threshold
+        self.slot = np.full(num_features, -1, dtype=np.intp)
+        self.indices = np.zeros(capacity, dtype=np.intp)
+        self.values = np.zeros((capacity, num_gvfs))
+        self.count = 0
+
+    # Traced features and their traces (count x num_gvfs)
+    def active(self):
+        return self.indices[:self.count], self.values[:self.count]
+
+    def decay(self, factors):
+        self.values[:self.count] *= factors
+
+    # e @ x for a binary x given by its active indices
+    def dot(self, active):
+        slots = self.slot[active]
+        slots = slots[slots >= 0]
+        return self.values[slots].sum(axis=0)
+
+    # Add amount (one value per GVF) to the traces of the active features
+    def add(self, active, amount):
+        new = np.unique(active[self.slot[active] < 0])
+        if len(new):
+            if self.count + len(new) > len(self.indices):
+                self._grow(self.count + len(new))
+            self.indices[self.count:self.count + len(new)] = new
+            self.values[self.count:self.count + len(new)] = 0
+            self.slot[new] = np.arange(self.count, self.count + len(new))
+            self.count += len(new)
+        np.add.at(self.values, self.slot[active], amount)
+
+    def prune(self):
+        keep = np.abs(self.values[:self.count]).max(axis=1) >= self.threshold
+        if keep.all():
+            return
+        self.slot[self.indices[:self.count][~keep]] = -1
+        kept = np.flatnonzero(keep)
+        self.count = len(kept)
+        self.indices[:self.count] = self.indices[kept]
+        self.values[:self.count] = self.values[kept]
+        self.slot[self.indices[:self.count]] = np.arange(self.count)
+
+    def clear(self):
+        self.slot[self.indices[:self.count]] = -1
+        self.count = 0
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self.indices))
+        self.indices = np.resize(self.indices, capacity)
+        values = np.zeros((capacity, self.values.shape[1]))
+        values[:self.count] = self.values[:self.count]
+        self.values = values
+
+# Horde learned with TD(lambda) (accumulating traces) or, with true_online=True, true online
+# TD(lambda) (dutch traces, van Seijen et al. 2016). lam = 0 reduces TD(lambda) to Horde's TD(0).
+class HordeTDLambda(Horde):
+    def __init__(self, num_features, gammas, cumulants, alpha, lam, num_active=1, true_online=False, trace_threshold=1e-4):
+        super().__init__(num_features, gammas, cumulants, alpha, num_active)
+        self.lam = lam
+        self.true_online = true_online
+        self.traces = SparseTraces(num_features, self.num_gvfs, trace_threshold)
+        self.trace_decay = self.gammas * lam
+        self.v_old = np.zeros(self.num_gvfs)  # True online: value of the previous state at the previous step
+
+    def update(self, active, c):
+        self.predict(active, out=self.v)
+        self.steps += 1
+        if not self.has_prev:
+            self.x_prev[:] = active
+            self.has_prev = True
+            self.delta[:] = 0
+            return self.delta
+        self.predict(self.x_prev, out=self.v_prev)
+        np.multiply(self.gammas, self.v, out=self.delta)
+        self.delta += c
+        self.delta -= self.v_prev
+
+        traces = self.traces
+        if self.true_online:
+            ex = traces.dot(self.x_prev)
+            traces.decay(self.trace_decay)
+            traces.add(self.x_prev, 1 - self.alpha * self.trace_decay * ex)
+        else:
+            traces.decay(self.trace_decay)
+            traces.add(self.x_prev, 1.0)
+        traces.prune()
+
+        indices, values = traces.active()
+        if self.true_online:
+            self.W[:, indices] += (self.alpha * (self.delta + self.v_prev - self.v_old))[:, None] * values.T
+            np.add.at(self.WT, self.x_prev, -(self.alpha * (self.v_prev - self.v_old)))
+            self.v_old[:] = self.v
+        else:
+            self.W[:, indices] += (self.alpha * self.delta)[:, None] * values.T
+        self.x_prev[:] = active
+        return self.delta
+
+    # Traces from the previous episode mustn't credit features across the gap
+    def reset_episode(self):
+        super().reset_episode()
+        self.traces.clear()
+        self.v_old[:] = 0
+
+    def state(self, copy=True):
+        indices, values = self.traces.active()
+        state = dict(super().state(copy=False), trace_indices=indices, trace_values=values, v_old=self.v_old)
+        return _copied(state) if copy else state
+
+    # A TD(0) state (no traces) warm starts the weights with empty traces
+    def load_state(self, state):
+        super().load_state(state)
+        traces = self.traces
+        traces.clear()
+        if 'trace_indices' in state:
+            count = len(state['trace_indices'])
+            if count > len(traces.indices):
+                traces._grow(count)
+            traces.indices[:count] = state['trace_indices']
+            traces.values[:count] = state['trace_values']
+            traces.slot[traces.indices[:count]] = np.arange(count)
+            traces.count = count
+            self.v_old[:] = state['v_old']
+
+# Horde learned with TD(0) and a step size per feature and per GVF, adapted online by IDBD
+# (Sutton 1992, as TIDBD in Kearney et al. 2018) or, with autostep=True, by Autostep (Mahmood et
+# al. 2012), which normalizes the meta update and caps the effective step size so that no single
+# update overshoots. alpha is the initial step size. h traces recent weight changes; the step sizes
+# of a feature grow while its updates keep agreeing with h and shrink when they alternate.
+# The semi-gradient forms are used (x_i^2 where the full gradient has x_i*(x_i - gamma*x'_i)), and
+# Autostep's normalization is over the active features, so a step touches only active rows.
+class HordeIDBD(Horde):
+    def __init__(self, num_features, gammas, cumulants, alpha, meta_step, num_active=1, autostep=False, tau=1e4):
+        super().__init__(num_features, gammas, cumulants, alpha, num_active)
+        self.meta_step = meta_step
+        self.autostep = autostep
+        self.tau = tau  # Autostep: steps over which the meta-gradient normalizer decays
+        # Feature-major like WT, so the rows of the active features are contiguous
+        self.A = np.empty((num_features, self.num_gvfs))
+        self.A[...] = alpha
+        self.H = np.zeros((num_features, self.num_gvfs))
+        self.V = np.zeros((num_features, self.num_gvfs))  # Autostep: running max of |delta*x*h|
+        self.ones = np.ones((num_active, 1))
+
+    def update(self, active, c):
+        self.predict(active, out=self.v)
+        if self.has_prev:
+            self.predict(self.x_prev, out=self.v_prev)
+        else:
+            self.v_prev[:] = 0
+        np.multiply(self.gammas, self.v, out=self.delta)
+        self.delta += c
+        self.delta -= self.v_prev
+        if self.has_prev:
+            self._step(self.x_prev, self.delta)
+        self.x_prev[:] = active
+        self.has_prev = True
+        self.steps += 1
+        return self.delta
+
+    def _step(self, features, delta):
+        if len(features) == 1:
+            rows, x, x2 = slice(features[0], features[0] + 1), self.ones, self.ones  # Views: updated in place
+        else:  # Hash collisions make x_i = 2, ...
+            rows, counts = np.unique(features, return_counts=True)
+            x = counts[:, None].astype(float)
+            x2 = x * x
+        A, H = self.A[rows], self.H[rows]
+        gradient = delta * x  # delta * x_i for every GVF
+        meta = gradient * H
+        if self.autostep:
+            V = self.V[rows]
+            magnitude = np.abs(meta)
+            np.maximum(magnitude, V + (A * x2 / self.tau) * (magnitude - V), out=V)
+            np.divide(meta, V, out=meta, where=V > 0)
+            self.V[rows] = V
+        meta *= self.meta_step
+        A *= np.exp(meta, out=meta)
+        if self.autostep:
+            A /= np.maximum((A * x2).sum(axis=0), 1)  # Effective step size alpha.x^2 of at most 1
+        self.A[rows] = A
+        update = A * gradient
+        self.WT[rows] += update
+        decay = 1 - A * x2
+        H *= np.maximum(decay, 0, out=decay)
+        H += update
+        self.H[rows] = H
+
+    def state(self, copy=True):
+        state = dict(super().state(copy=False), step_sizes=self.A, h=self.H, v=self.V)
+        return _copied(state) if copy else state
+
+    # A state without step sizes (TD(0) or TD(lambda)) warm starts the weights with the initial step sizes
+    def load_state(self, state):
+        super().load_state(state)
+        if 'step_sizes' in state:
+            self.A[...] = state['step_sizes']
+            self.H[...] = state['h']
+            self.V[...] = state['v']
+
+# Copy of every array in a state, keeping each one's memory layout
+def _copied(state):
+    return {name: np.array(array, order='K') for name, array in state.items()}
@@ -0,0 +1,180 @@
+import os
+import json
+import numpy as np
+from multiprocessing import shared_memory
+
+# --- Shared-Memory Telemetry -------------------------------------------------------------
+# The learning loop publishes every step into a ring buffer in shared memory; viewers and
+# loggers in other processes attach by name and read it through NumPy views, with no locks and
+# no copies. There is one writer and it never waits for readers.
+#
+# Layout: a fixed header, a JSON metadata block, then one array per field with 2*capacity rows.
+# Like TraceHistory, every step is written twice (row slot and slot + capacity), so the latest
+# n <= capacity steps of a field are always one contiguous slice. The writer touches rows of the
+# current slot only, so a reader's window of n steps stays valid for the next capacity - n steps.
+
+TELEMETRY_MAGIC = b'DXLTEL02'
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('count', '<u8'), ('closed', '<u8'), ('capacity', '<u8'),
+                         ('num_motors', '<u8'), ('num_gvfs', '<u8'), ('metadata_size', '<u8'), ('pid', '<u8')])
+METADATA_SIZE = 4096
+ALIGN = 64
+
+# (name, dtype, columns, initial value); columns are 'motors' or 'gvfs'
+FIELDS = [('t', '<f8', None, np.nan),
+          ('pos', '<i4', 'motors', 0),
+          ('vel', '<i4', 'motors', 0),
+          ('load', '<i2', 'motors', 0),
+          ('cumulant', '<f8', 'gvfs', np.nan),
+          ('prediction', '<f8', 'gvfs', np.nan),
+          ('verifier', '<f8', 'gvfs', np.nan),  # Delayed true return, written back once it is known
+          ('ew_rmse', '<f8', 'gvfs', np.nan),   # Running error against the verifier (predictionMetrics)
+          ('rupee', '<f8', 'gvfs', np.nan)]
+
+def _layout(capacity, num_motors, num_gvfs):
+    columns = {'motors': num_motors, 'gvfs': num_gvfs}
+    offset = -(-(HEADER_DTYPE.itemsize + METADATA_SIZE) // ALIGN) * ALIGN
+    fields = {}
+    for name, dtype, column, initial in FIELDS:
+        shape = (2 * capacity,) if column is None else (2 * capacity, columns[column])
+        fields[name] = (np.dtype(dtype), shape, offset, initial)
+        offset += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // ALIGN) * ALIGN
+    return fields, offset
+
+def _map_fields(buffer, capacity, num_motors, num_gvfs):
+    fields, _ = _layout(capacity, num_motors, num_gvfs)
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            for name, (dtype, shape, offset, _) in fields.items()}
+
+class TelemetryWriter:
+    def __init__(self, name, num_motors, num_gvfs, capacity=4096, metadata=None):
+        self.capacity = capacity
+        _, size = _layout(capacity, num_motors, num_gvfs)
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            _remove_stale(name)
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        self.fields = _map_fields(self.shm.buf, capacity, num_motors, num_gvfs)
+        for name, (_, _, _, initial) in _layout(capacity, num_motors, num_gvfs)[0].items():
+            self.fields[name][...] = initial
+        encoded = json.dumps(metadata or {}).encode()
+        if len(encoded) > METADATA_SIZE:
+            raise ValueError(f"Telemetry metadata is {len(encoded)} bytes, the limit is {METADATA_SIZE}")
+        self.shm.buf[HEADER_DTYPE.itemsize:HEADER_DTYPE.itemsize + len(encoded)] = encoded
+        self.header['capacity'] = capacity
+        self.header['num_motors'] = num_motors
+        self.header['num_gvfs'] = num_gvfs
+        self.header['metadata_size'] = len(encoded)
+        self.header['count'] = 0
+        self.header['closed'] = 0
+        self.header['pid'] = os.getpid()
+        self.header['magic'] = TELEMETRY_MAGIC  # Last, so readers never see a half-initialized header
+        self.count = 0
+
+    # Publish one step. The count is advanced after the data, so readers only see complete steps.
+    def publish(self, t, pos, vel, load, cumulant, prediction, ew_rmse, rupee):
+        slot = self.count % self.capacity
+        rows = (slot, slot + self.capacity)
+        fields = self.fields
+        for row in rows:
+            fields['t'][row] = t
+            fields['pos'][row] = pos
+            fields['vel'][row] = vel
+            fields['load'][row] = load
+            fields['cumulant'][row] = cumulant
+            fields['prediction'][row] = prediction
+            fields['ew_rmse'][row] = ew_rmse
+            fields['rupee'][row] = rupee
+            fields['verifier'][row] = np.nan
+        self.count += 1
+        self.header['count'] = self.count
+
+    # Overwrite one value per GVF column `lags[k]` steps back (lag=1 is the most recent step).
+    # Columns whose step has left the ring, or hasn't happened, or whose value is NaN are skipped.
+    def set_past(self, name, lags, values):
+        lags = np.asarray(lags)
+        values = np.asarray(values)
+        valid = (lags <= min(self.count, self.capacity)) & ~np.isnan(values)
+        if not valid.any():
+            return
+        columns = np.flatnonzero(valid)
+        rows = (self.count - lags[columns]) % self.capacity
+        field = self.fields[name]
+        field[rows, columns] = values[columns]
+        field[rows + self.capacity, columns] = values[columns]
+
+    def close(self):
+        self.header['closed'] = 1
+        del self.header, self.fields  # Release the views so the buffer can be closed
+        self.shm.close()
+        self.shm.unlink()
+
+class TelemetryReader:
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name)
+        _untrack(self.shm)
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        if self.header['magic'] != TELEMETRY_MAGIC:
+            raise ValueError(f"Shared memory {name!r} is not a telemetry buffer")
+        self.capacity = int(self.header['capacity'])
+        self.num_motors = int(self.header['num_motors'])
+        self.num_gvfs = int(self.header['num_gvfs'])
+        start = HEADER_DTYPE.itemsize
+        self.metadata = json.loads(bytes(self.shm.buf[start:start + int(self.header['metadata_size'])]) or b'{}')
+        self.fields = _map_fields(self.shm.buf, self.capacity, self.num_motors, self.num_gvfs)
+
+    # Steps published so far
+    @property
+    def count(self):
+        return int(self.header['count'])
+
+    @property
+    def closed(self):
+        return bool(self.header['closed'])
+
+    # Oldest-to-newest view (no copy) of the latest n steps of a field. Steps from before the
+    # first publish hold the initial values (NaN for floats). Keep n well below capacity.
+    def window(self, name, n):
+        end = (self.count - 1) % self.capacity + self.capacity + 1
+        return self.fields[name][end - n:end]
+
+    def close(self):
+        del self.header, self.fields
+        self.shm.close()
+
+# Unlink a buffer left behind by a writer that crashed. A buffer whose writer is still running, or
+# that isn't a telemetry buffer, is never removed: another learner may be publishing to it.
+def _remove_stale(name):
+    existing = shared_memory.SharedMemory(name)
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=existing.buf) if existing.size >= HEADER_DTYPE.itemsize else None
+    ours = header is not None and header['magic'] == TELEMETRY_MAGIC
+    pid = int(header['pid']) if ours else None
+    stale = ours and (bool(header['closed']) or not _process_alive(pid))
+    del header  # Release the view so the buffer can be closed
+    existing.close()
+    if not stale:
+        _untrack(existing)  # Otherwise this process's resource tracker would unlink it at exit
+        owner = f"process {pid}" if ours else "another program"
+        raise FileExistsError(f"Shared memory {name!r} is in use by {owner}; choose another telemetry name")
+    existing.unlink()
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        return True  # Windows frees shared memory with its last handle, so an existing buffer is live
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Before Python 3.13 every process that attaches to shared memory registers it with its resource
+# tracker, which unlinks it when that process exits; only the writer should unlink it
+def _untrack(shm):
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
@@ -0,0 +1,107 @@
+import time
+import argparse
+import matplotlib.pyplot as plt
+from telemetry import TelemetryReader
+from livePlot import LivePlot
+
+# --- Telemetry Viewer --------------------------------------------------------------------
+# Reference dashboard for module2_constantGamma.py, run as a separate process: attaches to the
+# shared-memory telemetry buffer and plots the hand's position, velocity and load with one GVF's
+# cumulant, prediction, verifier return and running errors. The learning loop never waits on it.
+#     python telemetryViewer.py NAME [--gvf K] [--window N] [--fps F]
+
+# Exposes telemetry windows under the channel names LivePlot asks for, as views (no copies)
+class TelemetryTraces:
+    def __init__(self, reader, window_size, channels):
+        self.reader = reader
+        self.window_size = window_size
+        self.channels = channels  # {channel name: (field, column)}
+
+    def view(self, name):
+        field, column = self.channels[name]
+        return self.reader.window(field, self.window_size)[:, column]
+
+# Attach to the buffer, waiting up to `timeout` seconds for the learner to create it
+def attach(name, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return TelemetryReader(name)
+        except FileNotFoundError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plot the learning loop's shared-memory telemetry.")
+    parser.add_argument('name', help="Telemetry buffer name (module2_constantGamma.py prints it on startup)")
+    parser.add_argument('--gvf', type=int, help="GVF to plot (default: the learner's main GVF)")
+    parser.add_argument('--window', type=int, default=200, help="Steps shown on the screen (default: 200)")
+    parser.add_argument('--fps', type=float, default=30, help="Redraw rate (default: 30)")
+    args = parser.parse_args()
+
+    reader = attach(args.name)
+    metadata = reader.metadata
+    hand_idx = metadata.get('hand_idx', 0)
+    gvf = args.gvf if args.gvf is not None else metadata.get('main_gvf', 0)
+    window = min(args.window, reader.capacity // 2)  # Leaves the writer half the ring before a window goes stale
+    labels = metadata.get('gvf_labels', [])
+    traces = TelemetryTraces(reader, window, {'pos': ('pos', hand_idx), 'vel': ('vel', hand_idx), 'load': ('load', hand_idx),
+                                              'cumulant': ('cumulant', gvf), 'pred': ('prediction', gvf),
+                                              'verifier': ('verifier', gvf), 'ew_rmse': ('ew_rmse', gvf),
+                                              'rupee': ('rupee', gvf)})
+
+    # --- Live Plotting Setup ---
+    plt.ion()
+    fig, axs = plt.subplots(4, 1, figsize=(10, 8))
+
+    # Axis 1: Present Position (top plot, left axis)
+    axs[0].set_xlabel('Time (Samples)')
+    axs[0].set_ylabel('Motor Position (0-4095)', color='blue')
+    line_pos, = axs[0].plot(traces.view('pos'), color='blue', label='Position')
+    axs[0].tick_params(axis='y', labelcolor='blue')
+    axs[0].set_ylim(0, 4095)
+
+    # Axis 2: Present Velocity (top plot, right axis)
+    axs0_left = axs[0].twinx() # This creates the second Y-axis
+    axs0_left.set_ylabel('Velocity', color='green')
+    line_vel, = axs0_left.plot(traces.view('vel'), color='green', alpha=0.6, label='Velocity')
+    axs0_left.tick_params(axis='y', labelcolor='green')
+    axs0_left.set_ylim(-100, 100)
+
+    # Axis 3: Present Load (middle plot)
+    axs[1].set_ylabel('Raw Load (0-2000)', color='red')
+    line_load, = axs[1].plot(traces.view('load'), color='red', alpha=0.6, label='Load')
+    axs[1].tick_params(axis='y', labelcolor='red')
+    axs[1].set_ylim(-400, 400)
+
+    # Axis 4: Normalized load and prediction (Bottom plot)
+    axs[2].set_ylabel('Cumulant Signal / Prediction', color='purple')
+    line_c, = axs[2].plot(traces.view('cumulant'), color='orange', alpha=0.6, label='Cumulant Signal')
+    line_pred, = axs[2].plot(traces.view('pred'), color='purple', alpha=0.6, label='Prediction')
+    line_verifier, = axs[2].plot(traces.view('verifier'), color='brown', alpha=0.6, label='Verifier')
+    axs[2].tick_params(axis='y', labelcolor='purple')
+    axs[2].set_ylim(-0.5, 1.5)
+    if gvf < len(labels):
+        axs[2].set_title(labels[gvf], fontsize='small')
+
+    # Axis 5: Prediction error against the verifier, and RUPEE (needs no verifier)
+    axs[3].set_ylabel('Error', color='black')
+    line_ew_rmse, = axs[3].plot(traces.view('ew_rmse'), color='black', alpha=0.6, label='EW RMSE')
+    line_rupee, = axs[3].plot(traces.view('rupee'), color='teal', alpha=0.6, label='RUPEE')
+    axs[3].set_ylim(0, 0.5)
+    axs[3].legend(loc='upper right', fontsize='small')
+
+    fig.tight_layout()
+    axs[0].grid(True, alpha=0.3)
+    axs[0].set_title(f"Motor {metadata.get('hand_id', '?')}: Position, Velocity, and Load")
+    livePlot = LivePlot(fig, {'pos': line_pos, 'vel': line_vel, 'load': line_load, 'cumulant': line_c,
+                              'pred': line_pred, 'verifier': line_verifier, 'ew_rmse': line_ew_rmse,
+                              'rupee': line_rupee}, traces, fps=args.fps)
+
+    try:
+        # Runs until the window is closed or the learner shuts down
+        livePlot.run(keep_running=lambda: not reader.closed)
+    except KeyboardInterrupt:
+        pass
+    plt.close(fig)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from tdLearners import Horde, HordeTDLambda, HordeIDBD
+from learnerCheckpoint import IncrementalCopy, save_checkpoint, load_checkpoint
+
+NUM_FEATURES = 300
+GAMMAS = [0.5, 0.9, 0.99]
+
+LEARNERS = {
+    'td0': lambda: Horde(NUM_FEATURES, GAMMAS, [None, None], 0.1),
+    'td_lambda': lambda: HordeTDLambda(NUM_FEATURES, GAMMAS, [None, None], 0.1, 0.9),
+    'true_online': lambda: HordeTDLambda(NUM_FEATURES, GAMMAS, [None, None], 0.1, 0.9, true_online=True),
+    'idbd': lambda: HordeIDBD(NUM_FEATURES, GAMMAS, [None, None], 0.1, 0.01),
+    'autostep': lambda: HordeIDBD(NUM_FEATURES, GAMMAS, [None, None], 0.1, 0.01, autostep=True),
+}
+
+def train(learner, steps, seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(steps):
+        learner.update(rng.integers(0, NUM_FEATURES, 1), rng.random(learner.num_gvfs))
+
+def assert_same_state(a, b):
+    assert a.keys() == b.keys()
+    for name in a:
+        np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+
+# A copy spread over several steps of a learner that isn't updating is exactly state()
+@pytest.mark.parametrize('kind', LEARNERS)
+def test_incremental_copy_equals_state(kind):
+    learner = LEARNERS[kind]()
+    train(learner, 500, seed=0)
+    copier = IncrementalCopy(learner, chunk_bytes=1024)
+    copier.start()
+    steps = 1
+    state = copier.step()
+    while state is None:
+        assert copier.active
+        state = copier.step()
+        steps += 1
+    assert steps > 1 and not copier.active
+    assert_same_state(state, learner.state())
+    train(learner, 10, seed=1)  # The copy is independent of the live arrays
+    assert not np.array_equal(state['W'], learner.W)
+
+# Saving, loading into a fresh learner and carrying on gives the same learner as never stopping
+@pytest.mark.parametrize('kind', LEARNERS)
+def test_checkpoint_round_trip(kind, tmp_path):
+    path = str(tmp_path / 'learner.ckpt')
+    learner = LEARNERS[kind]()
+    train(learner, 500, seed=0)
+    copier = IncrementalCopy(learner, chunk_bytes=4096)
+    copier.start()
+    state = None
+    while state is None:
+        state = copier.step()
+    save_checkpoint(path, state, {'learner': kind, 'steps': learner.steps})
+
+    loaded, metadata = load_checkpoint(path)
+    assert metadata == {'learner': kind, 'steps': 500}
+    assert_same_state(loaded, learner.state())
+    assert loaded['W'].flags.f_contiguous  # Layout is kept
+    restored = LEARNERS[kind]()
+    restored.load_state(loaded)
+    train(learner, 200, seed=1)
+    train(restored, 200, seed=1)
+    assert_same_state(restored.state(), learner.state())
+
+def test_mismatched_checkpoint_is_refused(tmp_path):
+    path = str(tmp_path / 'learner.ckpt')
+    save_checkpoint(path, LEARNERS['td0']().state(), {})
+    with pytest.raises(ValueError):
+        Horde(NUM_FEATURES + 1, GAMMAS, [None, None], 0.1).load_state(load_checkpoint(path)[0])
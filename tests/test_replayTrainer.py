@@ -0,0 +1,53 @@
+import numpy as np
+from sensorLog import SensorRecorder
+from replayTrainer import ReplayConfig, load_stream, replay, truncated_returns
+
+MOTOR_IDS = [1, 2, 4, 5]
+HAND_ID = 5
+PERIOD = 0.01
+
+# Log `steps` hand sweeps at PERIOD, leaving out the steps in `shed`
+def write_log(path, steps, shed=(), paused=()):
+    rng = np.random.default_rng(1)
+    recorder = SensorRecorder(path, MOTOR_IDS, chunk_records=256)
+    for i in range(steps):
+        if i in shed:
+            continue
+        pos = np.full(len(MOTOR_IDS), 1750 + (i * 37) % 900)
+        vel = np.full(len(MOTOR_IDS), 20 if (i // 25) % 2 else -20)
+        load = rng.integers(-200, 200, len(MOTOR_IDS))
+        recorder.record(i * PERIOD, pos, vel, load, pos, i in paused)
+    recorder.close()
+
+def test_truncated_returns_match_brute_force():
+    c = np.random.default_rng(2).random(50)
+    gamma, horizon = 0.8, 12
+    expected = [sum(gamma ** k * c[t + 1 + k] for k in range(horizon)) for t in range(len(c) - horizon)]
+    np.testing.assert_allclose(truncated_returns(c, gamma, horizon), expected)
+
+def test_unbroken_log_is_one_segment(tmp_path):
+    path = str(tmp_path / 'run.bin')
+    write_log(path, 200, paused=range(50, 60))
+    stream = load_stream(path, HAND_ID)
+    assert len(stream['keep']) == 190
+    assert stream['segment_starts'].tolist() == [0]
+
+# Shed steps split the stream, paused steps don't; a gap inside a pause splits at the next kept step
+def test_shed_steps_split_the_stream(tmp_path):
+    path = str(tmp_path / 'run.bin')
+    write_log(path, 200, shed={80, 81, 150}, paused=range(100, 110))
+    stream = load_stream(path, HAND_ID)
+    assert stream['segment_starts'].tolist() == [0, 80, 138]
+    write_log(path, 200, shed={105}, paused=range(100, 110))
+    assert load_stream(path, HAND_ID)['segment_starts'].tolist() == [0, 100]
+
+# Segments are learned as separate episodes and no return window spans a gap
+def test_replay_resets_at_gaps(tmp_path):
+    path = str(tmp_path / 'run.bin')
+    write_log(path, 400, shed={200})
+    stream = load_stream(path, HAND_ID)
+    result = replay(ReplayConfig(GAMMA=0.5), stream)
+    assert result['steps'] == 399 and result['segments'] == 2
+    assert np.isfinite(result['final_rmse'])
+    joined = replay(ReplayConfig(GAMMA=0.5), dict(stream, segment_starts=np.array([0])))
+    assert joined['segments'] == 1 and joined['rmse_curve'] != result['rmse_curve']
@@ -0,0 +1,42 @@
+import numpy as np
+from returnVerifier import StreamingVerifier, verifier_horizon
+
+# G_t = sum_{k<L} gamma^k c_{t+1+k}, summed directly
+def brute_force_return(c, gamma, horizon, t):
+    return sum(gamma ** k * c[t + 1 + k] for k in range(horizon))
+
+# update() returns the same two arrays every step, so each step's pair is copied before the next
+def run(verifier, cumulants, predictions):
+    delayed_predictions, delayed_returns = [], []
+    for c, p in zip(cumulants, predictions):
+        delayed_prediction, delayed_return = verifier.update(c, p)
+        delayed_predictions.append(delayed_prediction.copy())
+        delayed_returns.append(delayed_return.copy())
+    return np.array(delayed_predictions), np.array(delayed_returns)
+
+# The verifier's return for step s arrives at step s + L, aligned with the prediction made at s
+def test_matches_brute_force_truncated_return():
+    gammas = np.array([0.0, 0.5, 0.8, 0.9, 0.95])
+    steps = 600
+    rng = np.random.default_rng(0)
+    c = rng.random(steps)
+    predictions = rng.random((steps, len(gammas)))
+    verifier = StreamingVerifier(gammas)
+    delayed_predictions, delayed_returns = run(verifier, np.repeat(c[:, None], len(gammas), axis=1), predictions)
+    for g, gamma in enumerate(gammas):
+        L = verifier_horizon(gamma)
+        assert np.isnan(delayed_returns[:L, g]).all() and np.isnan(delayed_predictions[:L, g]).all()
+        # The cumulant fed at step t is c_{t}, so the return made available at step t covers c_{t-L+1..t}
+        expected = [brute_force_return(c, gamma, L, t - L) for t in range(L, steps)]
+        np.testing.assert_allclose(delayed_returns[L:, g], expected, rtol=1e-10, atol=1e-12)
+        np.testing.assert_array_equal(delayed_predictions[L:, g], predictions[:steps - L, g])
+
+def test_explicit_horizons_and_normalize():
+    gammas = [0.9, 0.9]
+    horizons = [3, 17]
+    c = np.random.default_rng(1).random(100)
+    verifier = StreamingVerifier(gammas, horizons=horizons, normalize=True)
+    _, delayed_returns = run(verifier, np.repeat(c[:, None], 2, axis=1), np.zeros((100, 2)))
+    for g, L in enumerate(horizons):
+        expected = [0.1 * brute_force_return(c, 0.9, L, t - L) for t in range(L, 100)]
+        np.testing.assert_allclose(delayed_returns[L:, g], expected, rtol=1e-10, atol=1e-12)
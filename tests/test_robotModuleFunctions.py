@@ -0,0 +1,29 @@
+import numpy as np
+from robotModuleFunctions import (normalize, bin, feature_index, cumulant_loadThreshold, normalize_batch, bin_batch,
+                                  feature_indices, cumulant_loadThreshold_batch)
+from replayTrainer import ReplayConfig
+
+# Positions and velocities around and past the normalization ranges, including the exact edges
+POS = np.concatenate([np.arange(1600, 2800), [0, 1750, 2650, 4095]]).astype(np.int32)
+VEL = np.concatenate([np.arange(-40, 41), [-20, 20, 0, -300, 300]]).astype(np.int32)
+
+def test_normalize_batch_equals_scalar():
+    expected = [normalize(p, 1750, 2650) for p in POS.tolist()]
+    np.testing.assert_array_equal(normalize_batch(POS, 1750, 2650), expected)
+
+def test_bin_batch_equals_scalar():
+    values = np.concatenate([np.linspace(-0.5, 1.5, 2001), [0.0, 0.1, 0.3, 0.7, 1.0]])
+    for num_bins in (1, 3, 10, 20):
+        np.testing.assert_array_equal(bin_batch(values, num_bins), [bin(v, num_bins) for v in values.tolist()])
+
+def test_feature_indices_equal_scalar():
+    pos, vel = [grid.ravel() for grid in np.meshgrid(POS, VEL)]
+    for config in (ReplayConfig(), ReplayConfig(NUM_POS_BINS=7, NUM_VEL_BINS=3, MOTOR_VELO=35)):
+        expected = [feature_index(p, v, config, config) for p, v in zip(pos.tolist(), vel.tolist())]
+        np.testing.assert_array_equal(feature_indices(pos, vel, config, config), expected)
+
+def test_cumulant_batch_equals_scalar():
+    load = np.concatenate([np.arange(-300, 301), [-32768, 32767]]).astype(np.int16)
+    for threshold in (0, 100, 250):
+        expected = [cumulant_loadThreshold(int(x), threshold) for x in load]
+        np.testing.assert_array_equal(cumulant_loadThreshold_batch(load, threshold), expected)
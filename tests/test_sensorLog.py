@@ -0,0 +1,50 @@
+import numpy as np
+from sensorLog import SensorRecorder, open_log, log_motor_ids, snapshot_records, motor_records
+
+MOTOR_IDS = [1, 2, 4, 5]
+
+def record_snapshots(path, num_snapshots, chunk_records):
+    rng = np.random.default_rng(0)
+    pos = rng.integers(0, 4096, (num_snapshots, len(MOTOR_IDS)))
+    vel = rng.integers(-100, 100, (num_snapshots, len(MOTOR_IDS)))
+    load = rng.integers(-400, 400, (num_snapshots, len(MOTOR_IDS))).astype(np.int16)
+    recorder = SensorRecorder(path, MOTOR_IDS, chunk_records=chunk_records)
+    for i in range(num_snapshots):
+        # Like capture_demo: limp arm, so the goal is the position
+        recorder.record(i * 0.01, pos[i], vel[i], load[i], pos[i], i % 7 == 0)
+    return recorder, pos, vel, load
+
+# A capture over several chunks grows (remaps) the file repeatedly and still reads back exactly
+def test_capture_across_chunks_round_trips(tmp_path):
+    path = str(tmp_path / 'demo.bin')
+    recorder, pos, vel, load = record_snapshots(path, 100, chunk_records=24)
+    assert recorder.capacity > 24
+    recorder.close()
+
+    assert log_motor_ids(path) == MOTOR_IDS
+    samples = snapshot_records(open_log(path), len(MOTOR_IDS))
+    assert samples.shape == (100, len(MOTOR_IDS))
+    np.testing.assert_array_equal(samples['pos'], pos)
+    np.testing.assert_array_equal(samples['goal'], pos)
+    np.testing.assert_array_equal(samples['vel'], vel)
+    np.testing.assert_array_equal(samples['load'], load)
+    np.testing.assert_array_equal(samples['motor_id'], np.tile(MOTOR_IDS, (100, 1)))
+    np.testing.assert_allclose(samples['t'][:, 0], np.arange(100) * 0.01)
+    np.testing.assert_array_equal(samples['paused'][:, 0], np.arange(100) % 7 == 0)
+    np.testing.assert_array_equal(motor_records(open_log(path), 4)['pos'], pos[:, 2])
+
+# close() trims the preallocated chunk, so the file holds exactly the records
+def test_close_truncates_to_records(tmp_path):
+    path = tmp_path / 'demo.bin'
+    recorder, _, _, _ = record_snapshots(str(path), 10, chunk_records=64)
+    recorder.close()
+    assert len(open_log(str(path))) == 40
+    assert path.stat().st_size == 64 + 40 * open_log(str(path)).dtype.itemsize
+
+# flush() makes everything so far readable while recording continues
+def test_flush_makes_partial_log_readable(tmp_path):
+    path = str(tmp_path / 'live.bin')
+    recorder, pos, _, _ = record_snapshots(path, 30, chunk_records=16)
+    recorder.flush()
+    np.testing.assert_array_equal(snapshot_records(open_log(path), len(MOTOR_IDS))['pos'], pos)
+    recorder.close()
@@ -0,0 +1,64 @@
+import numpy as np
+from tdLearners import SparseTD, Horde
+
+NUM_FEATURES = 200
+
+def random_walk(steps, num_active=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, NUM_FEATURES, (steps, num_active)), rng.random(steps)
+
+# The dense update SparseTD replaces: delta = c + GAMMA*w@x - w@x_prev; w = w + ALPHA*delta*x_prev
+def dense_td(active, cumulants, gamma, alpha):
+    w = np.zeros(NUM_FEATURES)
+    x_prev = np.zeros(NUM_FEATURES)
+    deltas = []
+    for indices, c in zip(active, cumulants):
+        x = np.bincount(indices, minlength=NUM_FEATURES).astype(float)
+        delta = c + gamma * w @ x - w @ x_prev
+        w = w + alpha * delta * x_prev
+        x_prev = x
+        deltas.append(delta)
+    return w, np.array(deltas)
+
+def sparse_td(active, cumulants, gamma, alpha):
+    learner = SparseTD(NUM_FEATURES, gamma, alpha, num_active=active.shape[1])
+    deltas = [learner.update(indices, c) for indices, c in zip(active, cumulants)]
+    return learner, np.array(deltas)
+
+# One-hot features: exactly the same numbers as the dense update
+def test_one_hot_is_bit_identical_to_dense():
+    active, cumulants = random_walk(2000)
+    w, deltas = dense_td(active, cumulants, 0.9, 0.1)
+    learner, sparse_deltas = sparse_td(active, cumulants, 0.9, 0.1)
+    np.testing.assert_array_equal(learner.w, w)
+    np.testing.assert_array_equal(sparse_deltas, deltas)
+
+# k-hot features with hash collisions: same update, summed in a different order
+def test_k_hot_matches_dense():
+    active, cumulants = random_walk(2000, num_active=8, seed=1)
+    active[::7, 1] = active[::7, 0]  # Collisions: x_i = 2
+    w, deltas = dense_td(active, cumulants, 0.8, 0.01)
+    learner, sparse_deltas = sparse_td(active, cumulants, 0.8, 0.01)
+    np.testing.assert_allclose(learner.w, w, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(sparse_deltas, deltas, rtol=1e-12, atol=1e-12)
+
+# Every GVF of a Horde learns exactly what a SparseTD with its gamma learns
+def test_horde_matches_sparse_td_per_gvf():
+    gammas = [0.5, 0.9, 0.99]
+    active, cumulants = random_walk(1000, seed=2)
+    horde = Horde(NUM_FEATURES, gammas, [None], 0.1)
+    singles = [SparseTD(NUM_FEATURES, gamma, 0.1) for gamma in gammas]
+    for indices, c in zip(active, cumulants):
+        horde.update(indices, np.full(len(gammas), c))
+        for learner in singles:
+            learner.update(indices, c)
+    for k, learner in enumerate(singles):
+        np.testing.assert_array_equal(horde.W[k], learner.w)
+
+def test_reset_episode_skips_one_transition():
+    active, cumulants = random_walk(100, seed=3)
+    learner, _ = sparse_td(active[:50], cumulants[:50], 0.9, 0.1)
+    learner.reset_episode()
+    w = learner.w.copy()
+    learner.update(active[50], cumulants[50])
+    np.testing.assert_array_equal(learner.w, w)
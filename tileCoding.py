@@ -0,0 +1,50 @@
+import numpy as np
+
+# --- Tile Coding -------------------------------------------------------------------------
+# num_tilings grids over the input box [lows, highs], each shifted by a fraction of a tile
+# (tiling t is displaced by t*(1, 3, 5, ...)/num_tilings tiles per dimension). Every tiling
+# contributes exactly one active tile, so a sample has num_tilings active features.
+# With hash_size set, tile indices are hashed into a table of that size instead of
+# allocating num_tilings * prod(tiles_per_dim + 1) features.
+
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing constant
+
+class TileCoder:
+    def __init__(self, lows, highs, tiles_per_dim, num_tilings, hash_size=None):
+        self.lows = np.asarray(lows, dtype=float)
+        self.highs = np.asarray(highs, dtype=float)
+        self.num_dims = len(self.lows)
+        self.tiles_per_dim = np.broadcast_to(np.asarray(tiles_per_dim, dtype=np.intp), (self.num_dims,)).copy()
+        self.num_tilings = num_tilings
+        self.hash_size = hash_size
+        self.scale = self.tiles_per_dim / (self.highs - self.lows)  # Tiles per input unit
+        # One extra tile per dimension so every shifted grid still covers the whole box
+        grid_shape = self.tiles_per_dim + 1
+        self.tiles_per_tiling = int(np.prod(grid_shape))
+        self.strides = np.cumprod(np.concatenate(([1], grid_shape[:0:-1])))[::-1].astype(np.intp)
+        displacement = 2 * np.arange(self.num_dims) + 1
+        self.offsets = (np.arange(num_tilings)[:, None] * displacement / num_tilings) % 1.0  # (tilings, dims)
+        self.tiling_base = np.arange(num_tilings, dtype=np.intp) * self.tiles_per_tiling
+        self.num_features = hash_size if hash_size is not None else num_tilings * self.tiles_per_tiling
+
+    # Active feature indices for one sample (shape (dims,) -> (tilings,)) or a batch
+    # (shape (n, dims) -> (n, tilings)), computed for all tilings at once
+    def active_indices(self, x, out=None):
+        x = np.asarray(x, dtype=float)
+        batch = np.atleast_2d(x)
+        scaled = (np.clip(batch, self.lows, self.highs) - self.lows) * self.scale
+        coords = np.floor(scaled[:, None, :] + self.offsets).astype(np.intp)  # (n, tilings, dims)
+        indices = coords @ self.strides + self.tiling_base
+        if self.hash_size is not None:
+            indices = self._hash(indices)
+        if x.ndim == 1:
+            indices = indices[0]
+        if out is not None:
+            out[...] = indices
+            return out
+        return indices
+
+    def _hash(self, indices):
+        hashed = indices.astype(np.uint64) * HASH_MULTIPLIER
+        hashed ^= hashed >> np.uint64(29)
+        return (hashed % np.uint64(self.hash_size)).astype(np.intp)